@@ -2,16 +2,41 @@
 
 import os
 import argparse
+import asyncio
+import base64
+import contextvars
+import functools
+import hashlib
+import inspect
+import hmac
+import logging
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
 import types
+from collections import OrderedDict, deque
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from datetime import datetime, timezone
+import anyio
 from dotenv import load_dotenv
 from jira import JIRA
 from fastmcp import FastMCP
 from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware
+from fastmcp.utilities.types import get_cached_typeadapter
 from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 import json
 
 ## Custom fields IDs
 QA_CONTACT_FID = "customfield_12315948"
+STORY_POINTS_FID = "customfield_12310243"
 
 # ─── 1. Load environment variables ─────────────────────────────────────────────
 load_dotenv()
@@ -21,11 +46,68 @@ JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
 JIRA_ENABLE_WRITE_OPERATIONS_STRING = os.getenv("JIRA_ENABLE_WRITE", "false")
 ENABLE_WRITE = JIRA_ENABLE_WRITE_OPERATIONS_STRING.lower() == "true"
 
+# Optional local issue store, see section 3
+JIRA_CACHE_DB = os.getenv("JIRA_CACHE_DB")
+JIRA_CACHE_PROJECTS = [
+    p.strip().upper() for p in os.getenv("JIRA_CACHE_PROJECTS", "").split(",") if p.strip()
+]
+JIRA_CACHE_SYNC_INTERVAL = int(os.getenv("JIRA_CACHE_SYNC_INTERVAL", "300"))
+JIRA_CACHE_MAX_AGE = int(os.getenv("JIRA_CACHE_MAX_AGE", "900"))
+
+# Custom fields added to every issue, as comma separated "output_name=Field name"
+# entries. A field can also be given by ID, see FieldRegistry in section 3.
+JIRA_CUSTOM_FIELDS = os.getenv(
+    "JIRA_CUSTOM_FIELDS", f"qa_contact={QA_CONTACT_FID},story_points={STORY_POINTS_FID}"
+)
+# Optional file with more entries, one per line, re-read whenever it changes
+JIRA_CUSTOM_FIELDS_FILE = os.getenv("JIRA_CUSTOM_FIELDS_FILE")
+
+# In-memory caches of issues, comments and search results, see section 4.
+# Disabled unless JIRA_CACHE_TTL is set to a number of seconds.
+JIRA_CACHE_TTL = int(os.getenv("JIRA_CACHE_TTL", "0"))
+JIRA_CACHE_MAX_ENTRIES = int(os.getenv("JIRA_CACHE_MAX_ENTRIES", "1000"))
+
+# Shared secret expected in the ?secret= parameter of Jira webhook calls
+JIRA_WEBHOOK_SECRET = os.getenv("JIRA_WEBHOOK_SECRET")
+
+# Upper bound on concurrent Jira requests made by a single tool call
+JIRA_MAX_CONCURRENCY = int(os.getenv("JIRA_MAX_CONCURRENCY", "8"))
+
+# Default size limit for search output, 0 means unlimited
+JIRA_MAX_OUTPUT_CHARS = int(os.getenv("JIRA_MAX_OUTPUT_CHARS", "100000"))
+
+# Most bytes of an attachment returned by one get_attachment call
+JIRA_MAX_ATTACHMENT_BYTES = int(os.getenv("JIRA_MAX_ATTACHMENT_BYTES", "1000000"))
+# Optional directory where downloaded attachments are kept, see section 6, with the
+# most bytes it holds and the largest attachment it downloads
+JIRA_ATTACHMENT_CACHE_DIR = os.getenv("JIRA_ATTACHMENT_CACHE_DIR")
+JIRA_ATTACHMENT_CACHE_MAX_BYTES = int(os.getenv("JIRA_ATTACHMENT_CACHE_MAX_BYTES", "1000000000"))
+JIRA_ATTACHMENT_CACHE_MAX_FILE_BYTES = int(
+    os.getenv("JIRA_ATTACHMENT_CACHE_MAX_FILE_BYTES", "50000000")
+)
+
+# Seconds the result of a write tool called with an idempotency_key is kept, see section 7
+JIRA_IDEMPOTENCY_TTL = int(os.getenv("JIRA_IDEMPOTENCY_TTL", "600"))
+
+# Seconds edits to the same issue are held to be merged into one request, 0 disables merging
+JIRA_WRITE_COALESCE_WINDOW = float(os.getenv("JIRA_WRITE_COALESCE_WINDOW", "0"))
+
+# Limits on tool calls running at once, in total and per caller token, see section 5.
+# Calls over the limits wait in a queue for up to JIRA_QUEUE_TIMEOUT seconds.
+JIRA_MAX_ACTIVE_CALLS = int(os.getenv("JIRA_MAX_ACTIVE_CALLS", "16"))
+JIRA_MAX_CALLS_PER_CALLER = int(os.getenv("JIRA_MAX_CALLS_PER_CALLER", "4"))
+JIRA_QUEUE_TIMEOUT = float(os.getenv("JIRA_QUEUE_TIMEOUT", "30"))
+
+logger = logging.getLogger("jira-mcp")
+
 jira_client = JIRA(server=JIRA_URL, token_auth=JIRA_API_TOKEN)
 
 # ─── 2. Create a Jira client ───────────────────────────────────────────────────
 #    Uses token_auth (API token) for authentication.
 
+# Client used by the calls of a batch, so they share the one it resolved
+batch_client = contextvars.ContextVar("batch_client", default=None)
+
 
 def get_jira_client(headers: dict[str, str]):
     """
@@ -40,6 +122,10 @@ def get_jira_client(headers: dict[str, str]):
     if jira_client is not None:
         return jira_client
 
+    # Calls made by the batch tool reuse its client
+    if (client := batch_client.get()) is not None:
+        return client
+
     # Server mode: extract token from authorization header
     auth_header = headers.get("authorization", headers.get("Authorization"))
     if auth_header:
@@ -52,27 +138,1381 @@ def get_jira_client(headers: dict[str, str]):
     raise RuntimeError("No access token available. Provide Authorization header with Bearer token.")
 
 
-# ─── 3. Instantiate the MCP server ─────────────────────────────────────────────
+def get_caller_id(headers: dict[str, str]):
+    """
+    Identify whose token a request uses, so cached results are only served to the
+    caller whose token fetched them. Returns None if there is no token.
+    """
+    if jira_client is not None:
+        return "env"
+    auth_header = headers.get("authorization", headers.get("Authorization"))
+    if not auth_header:
+        return None
+    return hashlib.sha256(auth_header.encode()).hexdigest()
+
+
+def get_json(client, path, params=None, agile=False):
+    """
+    GET a Jira REST path and return the parsed JSON.
+
+    Read tools pass the result straight to to_markdown, so this skips building
+    python-jira Resource objects only to read their .raw again.
+    """
+    base = client.AGILE_BASE_URL if agile else client.JIRA_BASE_URL
+    return client._get_json(path, params=params, base=base)
+
+
+def iter_agile_values(client, path, params=None):
+    """Yield every value of a paginated Jira Agile endpoint, one page at a time."""
+    start = 0
+    while True:
+        page = get_json(client, path, {**(params or {}), "startAt": start}, agile=True)
+        values = page.get("values", [])
+        yield from values
+        start += len(values)
+        if not values or page.get("isLast", True):
+            return
+
+
+def user_query_params(client, query):
+    """User search parameters: Cloud matches on "query", Server/DC on "username"."""
+    return {"query": query} if client._is_cloud else {"username": query}
+
+
+def map_concurrently(fn, items, max_workers=JIRA_MAX_CONCURRENCY):
+    """
+    Call fn on each item with up to max_workers threads.
+
+    Returns a (result, exception) pair per item, in the order of items.
+    """
+
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if len(items) <= 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(call, items))
+
+
+# ─── 3. Local issue store ──────────────────────────────────────────────────────
+#    Optionally mirrors the issues of JIRA_CACHE_PROJECTS into a SQLite file so
+#    repeated lookups can be answered without a Jira round trip.
+
+# Fields needed by IssueRecord, used to keep search responses small.
+# The custom fields of field_registry are requested as well, see issue_fields.
+ISSUE_FIELDS = [
+    "summary",
+    "status",
+    "assignee",
+    "reporter",
+    "priority",
+    "issuetype",
+    "fixVersions",
+    "created",
+    "updated",
+    "description",
+]
+
+# Seconds before Jira's field list is fetched again to resolve a field name it
+# did not know, such as a field created after the server started
+FIELD_REFRESH_INTERVAL = 300
+
+
+class FieldRegistry:
+    """
+    Custom fields shown with every issue, by output name.
+
+    Fields are configured by name ("Story Points") or ID ("customfield_10016").
+    Names are resolved to IDs once through Jira's /field endpoint and the
+    mapping is kept, so searches request exactly the fields they show. Entries
+    in 'path' are re-read whenever the file changes, without a restart.
+    """
+
+    def __init__(self, spec="", path=None):
+        self.spec = spec
+        self.path = path
+        # Called without arguments when the configured fields change
+        self.listeners = []
+        self._entries = self.parse(spec)
+        self._mtime = None
+        # Lower-case field name or ID -> field ID
+        self._ids = {}
+        self._fetched_at = None
+        self._fetch_lock = threading.Lock()
+
+    @staticmethod
+    def parse(text):
+        """
+        Output name -> field name or ID of "name=field" entries separated by
+        commas or lines. Without "name=" the output name is made from the field
+        name, e.g. "Story Points" becomes story_points.
+        """
+        entries = {}
+        for item in re.split(r"[,\n]", text):
+            item = item.strip()
+            if not item or item.startswith("#"):
+                continue
+            name, sep, field = item.partition("=")
+            if not sep:
+                field = name
+                name = re.sub(r"\W+", "_", field.lower()).strip("_")
+            entries[name.strip()] = field.strip()
+        return entries
+
+    def entries(self):
+        """The configured fields, re-read first if the file changed."""
+        if self.path:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+        return self._entries
+
+    def reload(self):
+        """Read the configured fields again and notify the listeners if they changed."""
+        entries = self.parse(self.spec)
+        mtime = None
+        if self.path:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path) as f:
+                    entries.update(self.parse(f.read()))
+            except OSError as e:
+                logger.warning("Could not read custom fields from %s: %s", self.path, e)
+        self._mtime = mtime
+        if entries == self._entries:
+            return
+        logger.info("Custom fields: %s", entries)
+        self._entries = entries
+        for listener in self.listeners:
+            listener()
+
+    def field_id(self, field, client=None):
+        """
+        ID of a field given by name or ID, None if it is unknown.
+
+        Jira's field list is fetched with 'client' when a name was not seen
+        before, at most once per FIELD_REFRESH_INTERVAL.
+        """
+        if re.fullmatch(r"customfield_\d+", field):
+            return field
+        key = field.lower()
+        if key not in self._ids and client is not None:
+            with self._fetch_lock:
+                stale = (
+                    self._fetched_at is None
+                    or time.monotonic() - self._fetched_at >= FIELD_REFRESH_INTERVAL
+                )
+                if key not in self._ids and stale:
+                    self._fetched_at = time.monotonic()
+                    try:
+                        fields = get_json(client, "field")
+                    except Exception as e:
+                        logger.warning("Failed to fetch the Jira field list: %s", e)
+                        fields = []
+                    ids = dict(self._ids)
+                    for f in fields:
+                        ids.setdefault(f["id"].lower(), f["id"])
+                        ids.setdefault(f["name"].lower(), f["id"])
+                    self._ids = ids
+        return self._ids.get(key)
+
+    def lookup(self, name, client=None):
+        """ID of a configured field by output name, or of any field by name or ID."""
+        return self.field_id(self.entries().get(name, name), client)
+
+    def resolve(self, client=None):
+        """(output name, field ID) pairs of the configured fields that could be resolved."""
+        resolved = []
+        for name, field in self.entries().items():
+            if field_id := self.field_id(field, client):
+                resolved.append((name, field_id))
+        return resolved
+
+
+field_registry = FieldRegistry(JIRA_CUSTOM_FIELDS, JIRA_CUSTOM_FIELDS_FILE)
+
+
+def issue_fields(custom_fields):
+    """Fields to request for IssueRecord, given the resolved custom fields."""
+    return ISSUE_FIELDS + [field_id for _, field_id in custom_fields]
+
+
+# Issues requested per page when paging through search results
+SEARCH_PAGE_SIZE = 500
+
+
+def search_json(client, jql, fields, start=0, max_results=SEARCH_PAGE_SIZE):
+    """
+    One page of the issues matching jql, as raw JSON.
+
+    Calls the search endpoint directly: python-jira's search_issues first
+    fetches the list of all fields to translate field names, one more request
+    per client, and so per tool call in HTTP mode.
+    """
+    params = {
+        "jql": jql,
+        "startAt": start,
+        "maxResults": max_results,
+        "fields": fields if isinstance(fields, str) else ",".join(fields),
+    }
+    return get_json(client, "search", params)
+
+
+def iter_search_raw(client, jql, fields, page_size=SEARCH_PAGE_SIZE):
+    """
+    Yield the raw JSON of every issue matching jql, fetching one page at a time
+    so large result sets never need to be held in memory.
+    """
+    start = 0
+    while True:
+        page = search_json(client, jql, fields, start, page_size)
+        issues = page.get("issues", [])
+        yield from issues
+        start += len(issues)
+        if not issues or start >= page.get("total", 0):
+            return
+
+
+def interned(value, attribute="name"):
+    """An attribute of a raw JSON object, such as a status name, as an interned string."""
+    name = value.get(attribute) if value else None
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def custom_value(value):
+    """Readable value of a raw custom field: the name of users and options, the names of lists."""
+    if isinstance(value, list):
+        return [custom_value(item) for item in value]
+    if isinstance(value, dict):
+        return next(
+            (
+                sys.intern(value[k])
+                for k in ("displayName", "name", "value", "key")
+                if isinstance(value.get(k), str)
+            ),
+            value,
+        )
+    # Server/DC returns sprints as strings like
+    # "com.atlassian.greenhopper...Sprint@1f[id=1,...,name=Sprint 1,...]"
+    if isinstance(value, str) and (sprint := re.search(r"\[.*\bname=([^,\]]*)", value)):
+        return sys.intern(sprint.group(1))
+    return value
+
+
+def user_id(user):
+    """Username (Server/DC) or accountId (Cloud) of a raw JSON user."""
+    return interned(user, "name") or interned(user, "accountId")
+
+
+class IssueRecord:
+    """
+    Compact issue holding only the fields in ISSUE_FIELDS and the custom
+    fields of field_registry.
+
+    Built straight from the raw JSON of an issue, without python-jira Resource
+    objects. Status, priority, type, version and user names are interned, so
+    the records of many issues share one copy of each repeated value.
+    """
+
+    __slots__ = (
+        "key",
+        "summary",
+        "status",
+        "assignee",
+        "assignee_id",
+        "custom",
+        "reporter",
+        "reporter_id",
+        "priority",
+        "issuetype",
+        "fix_version",
+        "created",
+        "updated",
+        "description",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_raw(cls, raw, custom_fields=None):
+        """
+        Record of a raw issue. 'custom_fields' are the (output name, field ID)
+        pairs to keep, field_registry.resolve() if omitted.
+        """
+        if custom_fields is None:
+            custom_fields = field_registry.resolve()
+        fields = raw.get("fields") or {}
+        assignee = fields.get("assignee")
+        reporter = fields.get("reporter")
+        fix_versions = fields.get("fixVersions")
+        return cls(
+            key=raw["key"],
+            summary=fields.get("summary"),
+            status=interned(fields.get("status")),
+            assignee=interned(assignee, "displayName"),
+            assignee_id=user_id(assignee),
+            custom=tuple(
+                (name, custom_value(fields.get(field_id))) for name, field_id in custom_fields
+            ),
+            reporter=interned(reporter, "displayName"),
+            reporter_id=user_id(reporter),
+            priority=interned(fields.get("priority")),
+            issuetype=interned(fields.get("issuetype")),
+            fix_version=interned(fix_versions[0]) if fix_versions else None,
+            created=fields.get("created"),
+            updated=fields.get("updated"),
+            description=fields.get("description"),
+        )
+
+    def as_dict(self):
+        """The fields shown to clients, essential ones only to keep output small."""
+        return {
+            "key": self.key,
+            "summary": self.summary,
+            "status": self.status,
+            "assignee": self.assignee,
+            **dict(self.custom or ()),
+            "reporter": self.reporter,
+            "priority": self.priority,
+            "issuetype": self.issuetype,
+            "fixVersion": self.fix_version,
+            "created": self.created,
+            "updated": self.updated,
+            "description": self.description,
+        }
+
+
+def simplify_comment(comment):
+    """The fields shown to clients of a comment, given as raw JSON."""
+    author = comment.get("author")
+    return {
+        "id": comment["id"],
+        "author": author.get("displayName", "Unknown") if author else "Unknown",
+        "body": comment.get("body"),
+        "created": comment.get("created"),
+        "updated": comment.get("updated", comment.get("created")),
+    }
+
+
+def parse_jira_datetime(value):
+    """Convert a Jira timestamp such as '2023-01-01T00:00:00.000+0000' to epoch seconds."""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+
+
+class UnsupportedJqlError(ValueError):
+    """Raised for JQL outside the subset the local issue store can evaluate."""
+
+
+class JqlQuery:
+    """
+    Parser for the JQL subset the local issue store can evaluate.
+
+    Supported: equality, inequality, IN / NOT IN and IS [NOT] EMPTY on project,
+    key, status, assignee, reporter, priority and issuetype, where EMPTY and NULL
+    also work as values of =, != and IN; comparisons of created/updated against
+    relative dates such as -7d or now(); AND, OR and parentheses; currentUser();
+    ORDER BY created, updated and key.
+    Anything else raises UnsupportedJqlError.
+    """
+
+    TOKEN = re.compile(
+        r"""\s*(?:(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')"""
+        r"""|(?P<op>!=|>=|<=|=|>|<|\(|\)|,)"""
+        r"""|(?P<word>[^\s"'(),=!<>~]+)|(?P<other>\S))"""
+    )
+
+    # JQL field name -> issues table column
+    TEXT_FIELDS = {
+        "project": "project",
+        "key": "key",
+        "issuekey": "key",
+        "status": "status",
+        "priority": "priority",
+        "issuetype": "issuetype",
+        "type": "issuetype",
+    }
+    USER_FIELDS = {"assignee": "assignee", "reporter": "reporter"}
+    DATE_FIELDS = {"created": "created_ts", "updated": "updated_ts"}
+    # Columns sorted on per ORDER BY field; keys sort by project first, as in Jira
+    ORDER_FIELDS = {
+        "created": ("created_ts",),
+        "updated": ("updated_ts",),
+        "key": ("project", "key_num"),
+    }
+
+    RELATIVE_DATE = re.compile(r"^([-+]?)(\d+)([wdhm])$", re.IGNORECASE)
+    UNIT_SECONDS = {"w": 7 * 86400, "d": 86400, "h": 3600, "m": 60}
+
+    def __init__(self, jql, current_user=None, now=None):
+        self.current_user = current_user
+        self.now = now if now is not None else time.time()
+        self.tokens = self._tokenize(jql)
+        self.pos = 0
+        self.params = []
+        self.projects = None
+        self.where = "1"
+        if not self._at_keyword("ORDER"):
+            self.where, self.projects = self._or_expr()
+        self.order_by = self._order_by()
+        if self.pos != len(self.tokens):
+            raise UnsupportedJqlError(f"Unexpected token {self.tokens[self.pos][1]!r}")
+
+    def _tokenize(self, jql):
+        tokens = []
+        for match in self.TOKEN.finditer(jql):
+            kind = match.lastgroup
+            value = match[kind]
+            if kind == "other":
+                raise UnsupportedJqlError(f"Unsupported character {value!r}")
+            if kind == "string":
+                value = re.sub(r"\\(.)", r"\1", value[1:-1])
+            tokens.append((kind, value))
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            raise UnsupportedJqlError("Unexpected end of query")
+        self.pos += 1
+        return token
+
+    def _at_keyword(self, *words):
+        kind, value = self._peek()
+        return kind == "word" and value.upper() in words
+
+    def _expect(self, kind, value):
+        token = self._next()
+        if token[0] != kind or token[1].upper() != value:
+            raise UnsupportedJqlError(f"Expected {value!r}, got {token[1]!r}")
+
+    def _or_expr(self):
+        sql, projects = self._and_expr()
+        parts = [sql]
+        while self._at_keyword("OR"):
+            self.pos += 1
+            other_sql, other_projects = self._and_expr()
+            parts.append(other_sql)
+            # An OR is only bounded to some projects if every branch is
+            projects = (
+                projects | other_projects
+                if projects is not None and other_projects is not None
+                else None
+            )
+        return (parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"), projects
+
+    def _and_expr(self):
+        sql, projects = self._primary()
+        parts = [sql]
+        while self._at_keyword("AND"):
+            self.pos += 1
+            other_sql, other_projects = self._primary()
+            parts.append(other_sql)
+            if other_projects is not None:
+                projects = other_projects if projects is None else projects & other_projects
+        return (parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"), projects
+
+    def _primary(self):
+        if self._peek() == ("op", "("):
+            self.pos += 1
+            result = self._or_expr()
+            self._expect("op", ")")
+            return result
+        return self._clause()
+
+    def _clause(self):
+        kind, field = self._next()
+        if kind not in ("word", "string"):
+            raise UnsupportedJqlError(f"Expected a field, got {field!r}")
+        field = field.lower()
+
+        if self._at_keyword("IS"):
+            self.pos += 1
+            negate = self._at_keyword("NOT")
+            if negate:
+                self.pos += 1
+            if not self._at_keyword("EMPTY", "NULL"):
+                raise UnsupportedJqlError("Expected EMPTY after IS")
+            self.pos += 1
+            column = self._column(field, allow_dates=True)
+            return f"{column} IS {'NOT ' if negate else ''}NULL", None
+
+        negate = self._at_keyword("NOT")
+        if negate or self._at_keyword("IN"):
+            if negate:
+                self.pos += 1
+            self._expect("word", "IN")
+            values = self._value_list()
+            return self._membership(field, values, negate)
+
+        kind, op = self._next()
+        if kind != "op" or op not in ("=", "!=", ">", ">=", "<", "<="):
+            raise UnsupportedJqlError(f"Unsupported operator {op!r}")
+        value = self._value()
+        if value is None:
+            if op not in ("=", "!="):
+                raise UnsupportedJqlError(f"Operator {op} is not supported with EMPTY")
+            column = self._column(field, allow_dates=True)
+            return f"{column} IS {'NOT ' if op == '!=' else ''}NULL", None
+        if field in self.DATE_FIELDS:
+            self.params.append(self._date(value))
+            return f"{self.DATE_FIELDS[field]} {op} ?", None
+        if op not in ("=", "!="):
+            raise UnsupportedJqlError(f"Operator {op} is only supported on dates")
+        return self._membership(field, [value], op == "!=")
+
+    def _membership(self, field, values, negate):
+        column = self._column(field)
+        parts = []
+        projects = None
+        if present := [v for v in values if v is not None]:
+            if field in self.USER_FIELDS:
+                # Users match on username/accountId or on display name
+                placeholders = ", ".join("?" * len(present))
+                self.params.extend(present + present)
+                sql = f"({column}_id IN ({placeholders}) OR {column} IN ({placeholders}))"
+                parts.append(f"NOT {sql}" if negate else sql)
+            else:
+                if column in ("project", "key"):
+                    present = [v.upper() for v in present]
+                placeholders = ", ".join("?" * len(present))
+                self.params.extend(present)
+                parts.append(f"{column} {'NOT IN' if negate else 'IN'} ({placeholders})")
+        if column == "project" and not negate:
+            projects = set(present)
+        if None in values:
+            parts.append(f"{column} IS {'NOT ' if negate else ''}NULL")
+        if len(parts) == 1:
+            return parts[0], projects
+        return "(" + (" AND " if negate else " OR ").join(parts) + ")", projects
+
+    def _column(self, field, allow_dates=False):
+        if field in self.TEXT_FIELDS:
+            return self.TEXT_FIELDS[field]
+        if field in self.USER_FIELDS:
+            return self.USER_FIELDS[field]
+        if allow_dates and field in self.DATE_FIELDS:
+            return self.DATE_FIELDS[field]
+        raise UnsupportedJqlError(f"Unsupported field {field!r}")
+
+    def _value_list(self):
+        self._expect("op", "(")
+        values = [self._value()]
+        while self._peek() == ("op", ","):
+            self.pos += 1
+            values.append(self._value())
+        self._expect("op", ")")
+        return values
+
+    def _value(self):
+        """The next value, None for the EMPTY and NULL keywords."""
+        kind, value = self._next()
+        if kind not in ("word", "string"):
+            raise UnsupportedJqlError(f"Expected a value, got {value!r}")
+        if kind == "word" and value.upper() in ("EMPTY", "NULL"):
+            return None
+        if kind == "word" and self._peek() == ("op", "("):
+            self.pos += 1
+            self._expect("op", ")")
+            return self._function(value)
+        return value
+
+    def _function(self, name):
+        if name.lower() == "currentuser" and self.current_user:
+            return self.current_user()
+        if name.lower() == "now":
+            return "0m"
+        raise UnsupportedJqlError(f"Unsupported function {name}()")
+
+    def _date(self, value):
+        match = self.RELATIVE_DATE.match(value)
+        if not match:
+            raise UnsupportedJqlError(f"Only relative dates are supported, got {value!r}")
+        sign, amount, unit = match.groups()
+        offset = int(amount) * self.UNIT_SECONDS[unit.lower()]
+        return self.now - offset if sign == "-" else self.now + offset
+
+    def _order_by(self):
+        if not self._at_keyword("ORDER"):
+            return "updated_ts DESC"
+        self.pos += 1
+        self._expect("word", "BY")
+        terms = []
+        while True:
+            kind, field = self._next()
+            if field.lower() not in self.ORDER_FIELDS:
+                raise UnsupportedJqlError(f"Unsupported ORDER BY field {field!r}")
+            direction = "ASC"
+            if self._at_keyword("ASC", "DESC"):
+                direction = self._next()[1].upper()
+            terms.extend(f"{column} {direction}" for column in self.ORDER_FIELDS[field.lower()])
+            if self._peek() != ("op", ","):
+                return ", ".join(terms)
+            self.pos += 1
+
+
+class IssueStore:
+    """
+    SQLite mirror of simplified issues for a set of projects.
+
+    Each project is synced incrementally with `updated >= -Nm` JQL, where N covers
+    the time since the previous sync plus a small overlap. Relative dates are used
+    because absolute JQL dates are interpreted in the Jira user's timezone.
+
+    Issues changed through this server are marked stale until a sync started
+    after the change: they are not served, and searches of their project go to
+    Jira.
+
+    Incremental syncs cannot see issues that were deleted or moved to another
+    project, so every RECONCILE_EVERY syncs, and on the first sync after a
+    restart, the keys of each project are listed and missing issues removed.
+    """
+
+    SYNC_OVERLAP_MINUTES = 2
+    RECONCILE_EVERY = 12
+
+    # Bump when the tables change, the store is then rebuilt by the next sync
+    SCHEMA_VERSION = 4
+
+    def __init__(self, path, projects=()):
+        self.path = path
+        self.projects = [p.upper() for p in projects]
+        # Incremental syncs per project since its keys were last reconciled
+        self._unreconciled = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                self._conn.executescript("""
+                    DROP TABLE IF EXISTS issues;
+                    DROP TABLE IF EXISTS sync_state;
+                    DROP TABLE IF EXISTS documents;
+                    DROP TABLE IF EXISTS stale_issues;
+                    """)
+                self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS issues (
+                    key TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    key_num INTEGER NOT NULL,
+                    status TEXT COLLATE NOCASE,
+                    assignee TEXT COLLATE NOCASE,
+                    assignee_id TEXT COLLATE NOCASE,
+                    reporter TEXT COLLATE NOCASE,
+                    reporter_id TEXT COLLATE NOCASE,
+                    priority TEXT COLLATE NOCASE,
+                    issuetype TEXT COLLATE NOCASE,
+                    created_ts REAL,
+                    updated_ts REAL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS issues_project ON issues (project, updated_ts);
+                CREATE INDEX IF NOT EXISTS issues_status ON issues (status);
+                CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assignee_id);
+                CREATE INDEX IF NOT EXISTS issues_updated ON issues (updated_ts);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    project TEXT PRIMARY KEY,
+                    last_sync REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS stale_issues (
+                    key TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    marked REAL NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5 (
+                    key UNINDEXED,
+                    comment_id UNINDEXED,
+                    title,
+                    body,
+                    tokenize = 'porter unicode61'
+                );
+                """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, issues):
+        """
+        Store issues given as raw JSON, replacing older copies.
+
+        The summary and description are added to the full-text index, as are the
+        comments if the issue was fetched with its comment field.
+        """
+        rows = []
+        documents = []
+        with_comments = []
+        custom_fields = field_registry.resolve()
+        for raw in issues:
+            record = IssueRecord.from_raw(raw, custom_fields)
+            documents.append((record.key, None, record.summary, record.description))
+            if comment_field := raw["fields"].get("comment"):
+                with_comments.append((record.key,))
+                documents.extend(
+                    (record.key, c["id"], None, c.get("body")) for c in comment_field["comments"]
+                )
+            project, _, num = record.key.rpartition("-")
+            rows.append(
+                (
+                    record.key,
+                    project,
+                    int(num),
+                    record.status,
+                    record.assignee,
+                    record.assignee_id,
+                    record.reporter,
+                    record.reporter_id,
+                    record.priority,
+                    record.issuetype,
+                    parse_jira_datetime(record.created),
+                    parse_jira_datetime(record.updated),
+                    json.dumps(record.as_dict()),
+                )
+            )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO issues (key, project, key_num, status, assignee,"
+                " assignee_id, reporter, reporter_id, priority, issuetype, created_ts,"
+                " updated_ts, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany(
+                "DELETE FROM documents WHERE key = ? AND comment_id IS NULL",
+                [row[:1] for row in rows],
+            )
+            self._conn.executemany(
+                "DELETE FROM documents WHERE key = ? AND comment_id IS NOT NULL", with_comments
+            )
+            self._conn.executemany(
+                "INSERT INTO documents (key, comment_id, title, body) VALUES (?, ?, ?, ?)",
+                documents,
+            )
+
+    def add_comment(self, issue_key, comment):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO documents (key, comment_id, title, body) VALUES (?, ?, NULL, ?)",
+                (issue_key, comment["id"], comment.get("body")),
+            )
+
+    def delete_comment(self, issue_key, comment_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM documents WHERE key = ? AND comment_id = ?", (issue_key, comment_id)
+            )
+
+    def delete(self, issue_key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM issues WHERE key = ?", (issue_key,))
+            self._conn.execute("DELETE FROM documents WHERE key = ?", (issue_key,))
+
+    def mark_stale(self, issue_key):
+        """Drop an issue that was just changed, until a later sync fetches it again."""
+        issue_key = issue_key.upper()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM issues WHERE key = ?", (issue_key,))
+            self._conn.execute("DELETE FROM documents WHERE key = ?", (issue_key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stale_issues (key, project, marked) VALUES (?, ?, ?)",
+                (issue_key, issue_key.rpartition("-")[0], time.time()),
+            )
+
+    def has_stale(self, project):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM stale_issues WHERE project = ? LIMIT 1", (project.upper(),)
+            ).fetchone()
+        return row is not None
+
+    def last_sync(self, project):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_sync FROM sync_state WHERE project = ?", (project.upper(),)
+            ).fetchone()
+        return row["last_sync"] if row else None
+
+    def is_fresh(self, project, max_age=None):
+        """True if the project is mirrored and was synced within max_age seconds."""
+        if max_age is None:
+            max_age = JIRA_CACHE_MAX_AGE
+        if project.upper() not in self.projects:
+            return False
+        last = self.last_sync(project)
+        return last is not None and time.time() - last <= max_age
+
+    def sync_project(self, client, project):
+        """Fetch issues of a project updated since its last sync."""
+        project = project.upper()
+        started = time.time()
+        jql = f'project = "{project}"'
+        last = self.last_sync(project)
+        if last is not None:
+            syncs = self._unreconciled.get(project, self.RECONCILE_EVERY)
+            if syncs >= self.RECONCILE_EVERY:
+                self.reconcile(client, project)
+                syncs = 0
+            self._unreconciled[project] = syncs + 1
+            minutes = int((started - last) // 60) + self.SYNC_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+        else:
+            self._unreconciled[project] = 1
+        count = 0
+        page = []
+        # Comments are fetched as well for the full-text index
+        fields = issue_fields(field_registry.resolve(client)) + ["comment"]
+        for raw in iter_search_raw(client, jql, fields):
+            page.append(raw)
+            if len(page) == SEARCH_PAGE_SIZE:
+                self.upsert(page)
+                count += len(page)
+                page = []
+        self.upsert(page)
+        count += len(page)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (project, last_sync) VALUES (?, ?)",
+                (project, started),
+            )
+            # Changes made before this sync started are included in it
+            self._conn.execute(
+                "DELETE FROM stale_issues WHERE project = ? AND marked < ?", (project, started)
+            )
+        return count
+
+    def reconcile(self, client, project):
+        """
+        Remove stored issues of a project that Jira no longer lists under it.
+        Returns the number removed.
+        """
+        keys = set()
+        totals = set()
+        start = 0
+        while True:
+            page = search_json(client, f'project = "{project}" ORDER BY key', "key", start)
+            issues = page.get("issues", [])
+            keys.update(issue["key"] for issue in issues)
+            totals.add(page.get("total", 0))
+            start += len(issues)
+            if not issues or start >= page.get("total", 0):
+                break
+        # Issues deleted while paging shift later pages, which could hide keys
+        if len(totals) != 1 or len(keys) != totals.pop():
+            logger.info("Issues of %s changed while listing them, not reconciled", project)
+            return 0
+        with self._lock, self._conn:
+            stored = self._conn.execute(
+                "SELECT key FROM issues WHERE project = ?", (project,)
+            ).fetchall()
+            missing = [(row["key"],) for row in stored if row["key"] not in keys]
+            self._conn.executemany("DELETE FROM issues WHERE key = ?", missing)
+            self._conn.executemany("DELETE FROM documents WHERE key = ?", missing)
+        return len(missing)
+
+    def sync(self, client):
+        for project in self.projects:
+            try:
+                count = self.sync_project(client, project)
+                logger.info("Synced %d issues for %s", count, project)
+            except Exception:
+                logger.exception("Failed to sync issues for %s", project)
+
+    def start_background_sync(self, client, interval=None):
+        """Sync all projects now and then every interval seconds in a daemon thread."""
+        interval = interval or JIRA_CACHE_SYNC_INTERVAL
+
+        def run():
+            while True:
+                self.sync(client)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="jira-issue-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def get_issue(self, issue_key, max_age=None):
+        """Return the stored issue dict, or None if missing or stale."""
+        project = issue_key.rpartition("-")[0]
+        if not self.is_fresh(project, max_age):
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM issues WHERE key = ?"
+                " AND key NOT IN (SELECT key FROM stale_issues)",
+                (issue_key.upper(),),
+            ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def search(self, jql, max_results, max_age=None, current_user=None):
+        """
+        Evaluate JQL against the store, or return None to fall through to Jira.
+
+        The query must be within the JqlQuery subset and limited to mirrored
+        projects that were synced within max_age seconds, with no stale issues.
+        """
+        try:
+            query = JqlQuery(jql, current_user=current_user)
+        except UnsupportedJqlError:
+            return None
+        if not query.projects or not all(
+            self.is_fresh(p, max_age) and not self.has_stale(p) for p in query.projects
+        ):
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM issues WHERE {query.where}"
+                f" ORDER BY {query.order_by} LIMIT ?",
+                (*query.params, max_results),
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    @staticmethod
+    def fts_query(text):
+        """Turn free text into an FTS5 query matching all words and "quoted phrases"."""
+        terms = []
+        for term in re.findall(r'"[^"]*"|\S+', text):
+            prefix = term.endswith("*") and not term.startswith('"')
+            term = term.strip('"*').replace('"', '""')
+            if term:
+                terms.append(f'"{term}"' + ("*" if prefix else ""))
+        return " ".join(terms)
+
+    def fulltext_search(self, text, max_results):
+        """Rank issues by BM25 over summaries, descriptions and comments."""
+        query = self.fts_query(text)
+        if not query:
+            return []
+        with self._lock:
+            # Summary matches weigh more than description or comment matches
+            rows = self._conn.execute(
+                """
+                SELECT documents.key, documents.comment_id,
+                       snippet(documents, 3, '**', '**', '…', 16) AS snippet,
+                       bm25(documents, 0, 0, 5.0, 1.0) AS rank,
+                       issues.data
+                FROM documents LEFT JOIN issues ON issues.key = documents.key
+                WHERE documents MATCH ?
+                ORDER BY rank
+                """,
+                (query,),
+            )
+            results = {}
+            for row in rows:
+                if row["key"] in results:
+                    continue
+                data = json.loads(row["data"]) if row["data"] else {}
+                results[row["key"]] = {
+                    "key": row["key"],
+                    "summary": data.get("summary"),
+                    "status": data.get("status"),
+                    "comment_id": row["comment_id"],
+                    "snippet": row["snippet"] or data.get("summary"),
+                    "score": round(-row["rank"], 3),
+                }
+                if len(results) == max_results:
+                    break
+        return list(results.values())
+
+
+issue_store = IssueStore(JIRA_CACHE_DB, JIRA_CACHE_PROJECTS) if JIRA_CACHE_DB else None
+
+
+# ─── 4. In-memory caches ───────────────────────────────────────────────────────
+#    Short-lived per-caller copies of issues, comments and search results.
+#    Writes made through this server and Jira webhook events (section 8) keep
+#    them up to date.
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ttl seconds after being set."""
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        if self.ttl <= 0:
+            return default
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Keyed by (caller id, issue key)
+issue_cache = TTLCache(JIRA_CACHE_TTL, JIRA_CACHE_MAX_ENTRIES)
+comment_cache = TTLCache(JIRA_CACHE_TTL, JIRA_CACHE_MAX_ENTRIES)
+# Keyed by (caller id, jql, max results)
+search_cache = TTLCache(JIRA_CACHE_TTL, JIRA_CACHE_MAX_ENTRIES)
+# Cached records lack fields added to the registry, and show removed ones
+field_registry.listeners.extend([issue_cache.clear, search_cache.clear])
+
+
+def cached_issue_keys(cache, issue_key):
+    """Keys of the cached copies of an issue; issue keys are cached upper-cased."""
+    return [key for key in cache.keys() if key[1] == issue_key.upper()]
+
+
+def invalidate_issue(issue_key, stale=True):
+    """
+    Forget cached copies of an issue after it changed. Unless stale is False,
+    for changes already applied to the store, the stored copy is marked stale.
+    """
+    if issue_store and stale:
+        issue_store.mark_stale(issue_key)
+    for key in cached_issue_keys(issue_cache, issue_key):
+        issue_cache.pop(key)
+    for key in cached_issue_keys(comment_cache, issue_key):
+        comment_cache.pop(key)
+    # Any change can alter which issues a query matches
+    search_cache.clear()
+
+
+# Users requested per user search while the directory is enabled, so later
+# narrower queries are more likely to be answered from the cached result
+USER_SEARCH_SIZE = 100
+# Largest page of users Jira returns, used when refreshing a project's users
+USER_REFRESH_SIZE = 1000
+
+
+def user_terms(user):
+    """Lower-cased display name, username and email of a raw user, plus their words."""
+    terms = set()
+    for value in (user.get("displayName"), user.get("name"), user.get("emailAddress")):
+        if value:
+            terms.add(value.lower())
+            terms.update(value.lower().split())
+    return tuple(terms)
+
+
+class UserDirectory:
+    """
+    Per-caller cache of user search results that also answers narrower queries.
+
+    Jira's user searches match the start of a user's display name, username or
+    email, so a result Jira did not truncate holds every user matching any query
+    that extends it. Those queries are answered by filtering the cached users on
+    the prefixes of their terms. Jira Cloud filters users by permission after
+    paging, so its results are never known to be complete and only repeated
+    queries are answered. Users seen in any result are kept by id for get_user.
+    """
+
+    def __init__(self, ttl, maxsize):
+        # Keyed by (caller id, scope, query), holding ([(user, terms)], complete, size)
+        self.results = TTLCache(ttl, maxsize)
+        # Keyed by (caller id, accountId or username)
+        self.users = TTLCache(ttl, maxsize)
+
+    @property
+    def enabled(self):
+        return self.results.ttl > 0
+
+    def lookup(self, caller, scope, query, max_results):
+        """Cached users matching query within scope, or None if Jira must be asked."""
+        query = query.strip().lower()
+        for end in range(len(query), -1, -1):
+            entry = self.results.get((caller, scope, query[:end]))
+            if entry is None:
+                continue
+            entries, complete, size = entry
+            if end == len(query) and (complete or max_results <= size):
+                return [user for user, _ in entries[:max_results]]
+            if end < len(query) and complete:
+                matches = (
+                    user for user, terms in entries if any(term.startswith(query) for term in terms)
+                )
+                return list(islice(matches, max_results))
+        return None
+
+    def add(self, client, caller, scope, query, users, size):
+        """Remember the result of a search for up to size users."""
+        entries = [(user, user_terms(user)) for user in users]
+        # Fewer users than asked for are all the matching ones, except on Cloud
+        complete = len(users) < size and not client._is_cloud
+        self.results.set((caller, scope, query.strip().lower()), (entries, complete, size))
+        for user in users:
+            self.add_user(caller, user)
+
+    def add_user(self, caller, user):
+        for key in ("accountId", "name"):
+            if user.get(key):
+                self.users.set((caller, user[key]), user)
+
+    def get_user(self, caller, user_id):
+        return self.users.get((caller, user_id))
+
+    def refresh_project(self, client, project):
+        """Cache every user assignable in a project, so its user lookups stay local."""
+        params = {**user_query_params(client, ""), "projectKeys": project}
+        params["maxResults"] = USER_REFRESH_SIZE
+        users = get_json(client, "user/assignable/multiProjectSearch", params)
+        self.add(client, "env", ("project", project), "", users, USER_REFRESH_SIZE)
+        return len(users)
+
+    def start_background_refresh(self, client, projects):
+        """Refresh the users of projects in a daemon thread, before their entries expire."""
+        interval = self.results.ttl * 3 / 4
+
+        def run():
+            while True:
+                for project in projects:
+                    try:
+                        count = self.refresh_project(client, project)
+                        logger.info("Cached %d assignable users for %s", count, project)
+                    except Exception:
+                        logger.exception("Failed to cache assignable users for %s", project)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="jira-user-refresh", daemon=True)
+        thread.start()
+        return thread
+
+
+user_directory = UserDirectory(JIRA_CACHE_TTL, JIRA_CACHE_MAX_ENTRIES)
+
+
+def search_user_directory(path, scope, query, max_results, params=None):
+    """
+    Run a Jira user search through the user directory.
+
+    scope names what the search is limited to, such as ("project", key), so
+    results of differently limited searches are not mixed.
+    """
+    client = get_jira_client(get_http_headers())
+    caller = get_caller_id(get_http_headers())
+    if caller and (users := user_directory.lookup(caller, scope, query, max_results)) is not None:
+        return users
+
+    size = max(max_results, USER_SEARCH_SIZE) if caller and user_directory.enabled else max_results
+    params = {**user_query_params(client, query), **(params or {}), "maxResults": size}
+    users = get_json(client, path, params)
+    if caller:
+        user_directory.add(client, caller, scope, query, users, size)
+    return users[:max_results]
+
+
+# ─── 5. Instantiate the MCP server ─────────────────────────────────────────────
 mcp = FastMCP("Jira Context Server")
 
 
-# ─── 4. Register the get_jira tool ─────────────────────────────────────────────
+class ThreadedToolCalls(Middleware):
+    """
+    Run each tool call in a worker thread. The tools are synchronous, so FastMCP
+    would otherwise run them one at a time on the event loop.
+    """
+
+    async def on_call_tool(self, context, call_next):
+        return await anyio.to_thread.run_sync(lambda: asyncio.run(call_next(context)))
+
+
+class FairScheduler(Middleware):
+    """
+    Limit how many tool calls run at once, in total and per caller.
+
+    Calls over the limits wait, and are admitted round-robin across callers as
+    running calls finish, so a caller with many queued calls cannot starve the
+    others. A call that waits longer than timeout seconds fails with 503.
+    A batch takes one slot for each of its calls that can run at once.
+    All state is only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_active, max_per_caller, timeout):
+        self.max_active = max_active
+        self.max_per_caller = max_per_caller
+        self.timeout = timeout
+        self.total_active = 0
+        self.active = {}
+        # (future, slots) of waiting calls per caller, in the order callers are served
+        self.waiting = OrderedDict()
+        self.completed = 0
+        self.timeouts = 0
+
+    def _slots(self, context):
+        """Slots a call needs: a batch runs up to max_per_caller of its calls at once."""
+        if context.message.name != "batch":
+            return 1
+        calls = (context.message.arguments or {}).get("calls")
+        calls = len(calls) if isinstance(calls, list) else 1
+        return max(1, min(calls, self.max_per_caller, self.max_active))
+
+    def _can_start(self, caller, slots):
+        return (
+            self.total_active + slots <= self.max_active
+            and self.active.get(caller, 0) + slots <= self.max_per_caller
+        )
+
+    def _start(self, caller, slots):
+        self.total_active += slots
+        self.active[caller] = self.active.get(caller, 0) + slots
+
+    def _finish(self, caller, slots):
+        self.completed += 1
+        self._release(caller, slots)
+
+    def _release(self, caller, slots):
+        self.total_active -= slots
+        self.active[caller] -= slots
+        if not self.active[caller]:
+            del self.active[caller]
+        self._admit()
+
+    def _admit(self):
+        """Start waiting calls while there is room, taking turns between callers."""
+        admitted = True
+        while admitted and self.total_active < self.max_active:
+            admitted = False
+            for caller in list(self.waiting):
+                queue = self.waiting[caller]
+                # Drop calls that timed out or were cancelled
+                while queue and queue[0][0].done():
+                    queue.popleft()
+                if not queue:
+                    del self.waiting[caller]
+                    continue
+                future, slots = queue[0]
+                if not self._can_start(caller, slots):
+                    continue
+                self._start(caller, slots)
+                queue.popleft()
+                future.set_result(None)
+                if queue:
+                    self.waiting.move_to_end(caller)
+                else:
+                    del self.waiting[caller]
+                admitted = True
+                break
+
+    async def on_call_tool(self, context, call_next):
+        caller = get_caller_id(get_http_headers())
+        slots = self._slots(context)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(caller, deque()).append((future, slots))
+        self._admit()
+        if not future.done():
+            try:
+                await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                # Since Python 3.12 the timeout can fire after the call was admitted
+                if future.done() and not future.cancelled():
+                    self._release(caller, slots)
+                self.timeouts += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Timed out after {self.timeout}s waiting for earlier tool calls",
+                )
+            except BaseException:
+                if future.done() and not future.cancelled():
+                    self._release(caller, slots)
+                raise
+        try:
+            return await call_next(context)
+        finally:
+            self._finish(caller, slots)
+
+    def metrics(self):
+        depths = [sum(not f.done() for f, _ in queue) for queue in self.waiting.values()]
+        return {
+            "active_calls": self.total_active,
+            "queued_calls": sum(depths),
+            "active_callers": len(self.active),
+            "queued_callers": sum(1 for depth in depths if depth),
+            "max_queue_depth": max(depths, default=0),
+            "completed_calls": self.completed,
+            "queue_timeouts": self.timeouts,
+        }
+
+
+scheduler = FairScheduler(JIRA_MAX_ACTIVE_CALLS, JIRA_MAX_CALLS_PER_CALLER, JIRA_QUEUE_TIMEOUT)
+mcp.add_middleware(scheduler)
+mcp.add_middleware(ThreadedToolCalls())
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> JSONResponse:
+    """Tool call queue depths, for monitoring the server in HTTP mode."""
+    return JSONResponse(scheduler.metrics())
+
+
+# ─── 6. Register the get_jira tool ─────────────────────────────────────────────
 @mcp.tool()
-def get_jira(issue_key: str) -> str:
+def get_jira(issue_key: str, max_age: int = None) -> str:
     """
     Fetch the Jira issue identified by 'issue_key' then
     return a Markdown string: "# ISSUE-KEY: summary\n\ndescription"
+
+    If the local issue store mirrors the project, a copy synced within
+    'max_age' seconds is returned without contacting Jira.
     """
+    caller = get_caller_id(get_http_headers())
+    cached = issue_store.get_issue(issue_key, max_age) if issue_store else None
+    if cached is None and (record := issue_cache.get((caller, issue_key.upper()))):
+        cached = record.as_dict()
+    if cached:
+        return f"# {issue_key}: {cached['summary'] or ''}\n\n{cached['description'] or ''}"
+
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
+        client = get_jira_client(get_http_headers())
+        fields = issue_fields(field_registry.resolve(client))
+        raw = get_json(client, f"issue/{issue_key}", {"fields": ",".join(fields)})
     except Exception as e:
         # If the JIRA client raises an error (e.g. issue not found),
         # wrap it in an HTTPException so MCP/Client sees a 4xx/5xx.
         raise HTTPException(status_code=404, detail=f"Failed to fetch Jira issue {issue_key}: {e}")
 
+    if issue_store:
+        issue_store.upsert([raw])
+    if caller:
+        issue_cache.set((caller, issue_key.upper()), IssueRecord.from_raw(raw))
+
     # Extract summary & description fields
-    summary = issue.fields.summary or ""
-    description = issue.fields.description or ""
+    summary = raw["fields"].get("summary") or ""
+    description = raw["fields"].get("description") or ""
 
     return f"# {issue_key}: {summary}\n\n{description}"
 
@@ -88,44 +1528,153 @@ def to_markdown(obj):
         return str(obj)
 
 
+# Issue fields dropped from oversized search output, least useful first.
+# Custom fields are dropped right after comments, see drop_order.
+ISSUE_FIELD_DROP_ORDER = [
+    "description",
+    "comments",
+    "fixVersion",
+    "reporter",
+    "created",
+    "priority",
+    "issuetype",
+]
+
+# Room kept for the note describing what was elided
+BUDGET_NOTE_RESERVE = 400
+
+
+def drop_order():
+    """ISSUE_FIELD_DROP_ORDER with the custom fields of field_registry after comments."""
+    at = ISSUE_FIELD_DROP_ORDER.index("comments") + 1
+    custom = [name for name in field_registry.entries() if name not in ISSUE_FIELD_DROP_ORDER]
+    return ISSUE_FIELD_DROP_ORDER[:at] + custom + ISSUE_FIELD_DROP_ORDER[at:]
+
+
+def truncate_text(text, limit):
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit] + "…"
+
+
+def budgeted_markdown(issues, max_chars=None):
+    """
+    Render simplified issues with to_markdown, keeping the output within max_chars.
+
+    Descriptions are shortened first, all to the same length, then fields are
+    dropped in drop_order(), then trailing issues are left out.
+    A note at the end says what was elided.
+    """
+    if max_chars is None:
+        max_chars = JIRA_MAX_OUTPUT_CHARS
+    issues = list(issues)
+    full = to_markdown(issues)
+    if max_chars <= 0 or len(full) <= max_chars:
+        return full
+
+    budget = max(max_chars - BUDGET_NOTE_RESERVE, 0)
+
+    def shorten(limit):
+        return [
+            {**issue, "description": truncate_text(issue.get("description"), limit)}
+            for issue in issues
+        ]
+
+    # Binary search for the longest description length that fits
+    low, high = 0, max(len(issue.get("description") or "") for issue in issues)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(to_markdown(shorten(middle))) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    trimmed = shorten(low)
+    notes = []
+    if shortened := sum(len(issue.get("description") or "") > low for issue in issues):
+        notes.append(f"{shortened} descriptions cut to {low} characters")
+
+    dropped = []
+    for field in drop_order():
+        if len(to_markdown(trimmed)) <= budget:
+            break
+        trimmed = [{k: v for k, v in issue.items() if k != field} for issue in trimmed]
+        dropped.append(field)
+    if dropped:
+        notes.append(f"fields removed: {', '.join(dropped)}")
+
+    kept, size = 0, 0
+    for issue in trimmed:
+        size += len(to_markdown(issue)) + 1
+        if size - 1 > budget:
+            break
+        kept += 1
+    if kept < len(trimmed):
+        notes.append(f"{len(trimmed) - kept} of {len(trimmed)} issues left out")
+        trimmed = trimmed[:kept]
+
+    text = to_markdown(trimmed)
+    hint = "Call get_jira for the full text of an issue"
+    if kept < len(issues):
+        hint += ", or narrow the JQL or lower max_results to see the rest"
+    note = (
+        f"_Output limited to {max_chars} characters, {len(full) - len(text)}"
+        f" characters elided ({'; '.join(notes)}). {hint}._"
+    )
+    if len(text) + len(note) + 2 > max_chars:
+        # Limits below BUDGET_NOTE_RESERVE leave no room for the full note
+        note = f"_Output limited to {max_chars} characters._"[:max_chars]
+    return f"{text}\n\n{note}" if text else note
+
+
 @mcp.tool()
-def search_issues(jql: str, max_results: int = 100) -> str:
-    """Search issues using JQL."""
+def search_issues(
+    jql: str, max_results: int = 100, max_age: int = None, max_output_chars: int = None
+) -> str:
+    """
+    Search issues using JQL.
 
-    def simplify_issue(issue):
-        """Extract only essential fields to avoid token limit issues"""
-        return {
-            "key": issue.key,
-            "summary": issue.fields.summary,
-            "status": issue.fields.status.name if issue.fields.status else None,
-            "assignee": (issue.fields.assignee.displayName if issue.fields.assignee else None),
-            "qa_contact": (
-                qa_contact.displayName
-                if (qa_contact := getattr(issue.fields, QA_CONTACT_FID, None))
-                else None
-            ),
-            "reporter": (issue.fields.reporter.displayName if issue.fields.reporter else None),
-            "priority": (issue.fields.priority.name if issue.fields.priority else None),
-            "issuetype": (issue.fields.issuetype.name if issue.fields.issuetype else None),
-            "fixVersion": (issue.fields.fixVersions[0].name if issue.fields.fixVersions else None),
-            "created": issue.fields.created,
-            "updated": issue.fields.updated,
-            "description": issue.fields.description,
-        }
+    Simple queries (equality, IN, AND/OR, relative dates, ORDER BY created,
+    updated or key) on projects mirrored by the local issue store are answered
+    locally when the store was synced within 'max_age' seconds.
 
-    try:
-        issues = get_jira_client(get_http_headers()).search_issues(jql, maxResults=max_results)
-        return to_markdown((simplify_issue(issue) for issue in issues))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"JQL search failed: {e}")
+    Output longer than 'max_output_chars' (server default if omitted, 0 for no
+    limit) is shortened, starting with issue descriptions.
+    """
+    if issue_store:
+        cached = issue_store.search(
+            jql,
+            max_results,
+            max_age,
+            current_user=lambda: get_jira_client(get_http_headers()).current_user(),
+        )
+        if cached is not None:
+            return budgeted_markdown(cached, max_output_chars)
+
+    caller = get_caller_id(get_http_headers())
+    if (records := search_cache.get((caller, jql, max_results))) is None:
+        try:
+            client = get_jira_client(get_http_headers())
+            custom_fields = field_registry.resolve(client)
+            fields = issue_fields(custom_fields)
+            page_size = max(min(max_results, SEARCH_PAGE_SIZE), 1)
+            issues = list(islice(iter_search_raw(client, jql, fields, page_size), max_results))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"JQL search failed: {e}")
+
+        if issue_store:
+            issue_store.upsert(issues)
+        records = [IssueRecord.from_raw(raw, custom_fields) for raw in issues]
+        if caller:
+            search_cache.set((caller, jql, max_results), records)
+    return budgeted_markdown((record.as_dict() for record in records), max_output_chars)
 
 
 @mcp.tool()
 def search_users(query: str, max_results: int = 10) -> str:
     """Search users by query."""
     try:
-        users = get_jira_client(get_http_headers()).search_users(query, maxResults=max_results)
-        return to_markdown([u.raw for u in users])
+        users = search_user_directory("user/search", "users", query, max_results)
+        return to_markdown(users)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to search users: {e}")
 
@@ -134,8 +1683,7 @@ def search_users(query: str, max_results: int = 10) -> str:
 def list_projects() -> str:
     """List all projects."""
     try:
-        projects = get_jira_client(get_http_headers()).projects()
-        return to_markdown([p.raw for p in projects])
+        return to_markdown(get_json(get_jira_client(get_http_headers()), "project"))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch projects: {e}")
 
@@ -144,8 +1692,8 @@ def list_projects() -> str:
 def get_project(project_key: str) -> str:
     """Get a project by key."""
     try:
-        project = get_jira_client(get_http_headers()).project(project_key)
-        return to_markdown(project)
+        client = get_jira_client(get_http_headers())
+        return to_markdown(get_json(client, f"project/{project_key}"))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch project: {e}")
 
@@ -154,8 +1702,8 @@ def get_project(project_key: str) -> str:
 def get_project_components(project_key: str) -> str:
     """Get components for a project."""
     try:
-        components = get_jira_client(get_http_headers()).project_components(project_key)
-        return to_markdown([c.raw for c in components])
+        client = get_jira_client(get_http_headers())
+        return to_markdown(get_json(client, f"project/{project_key}/components"))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch components: {e}")
 
@@ -164,8 +1712,8 @@ def get_project_components(project_key: str) -> str:
 def get_project_versions(project_key: str) -> str:
     """Get versions for a project."""
     try:
-        versions = get_jira_client(get_http_headers()).project_versions(project_key)
-        return to_markdown([v.raw for v in versions])
+        client = get_jira_client(get_http_headers())
+        return to_markdown(get_json(client, f"project/{project_key}/versions"))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch versions: {e}")
 
@@ -184,8 +1732,8 @@ def get_project_roles(project_key: str) -> str:
 def get_project_permission_scheme(project_key: str) -> str:
     """Get permission scheme for a project."""
     try:
-        scheme = get_jira_client(get_http_headers()).project_permissionscheme(project_key)
-        return to_markdown(scheme.raw)
+        client = get_jira_client(get_http_headers())
+        return to_markdown(get_json(client, f"project/{project_key}/permissionscheme"))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch permission scheme: {e}")
 
@@ -194,8 +1742,9 @@ def get_project_permission_scheme(project_key: str) -> str:
 def get_project_issue_types(project_key: str) -> str:
     """Get issue types for a project."""
     try:
-        types = get_jira_client(get_http_headers()).project_issue_types(project_key)
-        return to_markdown([t.raw for t in types])
+        client = get_jira_client(get_http_headers())
+        types = get_json(client, f"issue/createmeta/{project_key}/issuetypes")
+        return to_markdown(types["values"])
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch issue types: {e}")
 
@@ -214,8 +1763,15 @@ def get_current_user() -> str:
 def get_user(account_id: str) -> str:
     """Get user by account ID."""
     try:
-        user = get_jira_client(get_http_headers()).user(account_id)
-        return to_markdown(user.raw)
+        caller = get_caller_id(get_http_headers())
+        if caller and (user := user_directory.get_user(caller, account_id)):
+            return to_markdown(user)
+        client = get_jira_client(get_http_headers())
+        key = "accountId" if client._is_cloud else "username"
+        user = get_json(client, "user", {key: account_id})
+        if caller:
+            user_directory.add_user(caller, user)
+        return to_markdown(user)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch user: {e}")
 
@@ -226,10 +1782,14 @@ def get_assignable_users_for_project(
 ) -> str:
     """Get assignable users for a project."""
     try:
-        users = get_jira_client(get_http_headers()).search_assignable_users_for_projects(
-            query, project_key, maxResults=max_results
+        users = search_user_directory(
+            "user/assignable/multiProjectSearch",
+            ("project", project_key.upper()),
+            query,
+            max_results,
+            {"projectKeys": project_key},
         )
-        return to_markdown([u.raw for u in users])
+        return to_markdown(users)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to get assignable users: {e}")
 
@@ -238,10 +1798,14 @@ def get_assignable_users_for_project(
 def get_assignable_users_for_issue(issue_key: str, query: str = "", max_results: int = 10) -> str:
     """Get assignable users for an issue."""
     try:
-        users = get_jira_client(get_http_headers()).search_assignable_users_for_issues(
-            query, issueKey=issue_key, maxResults=max_results
+        users = search_user_directory(
+            "user/assignable/search",
+            ("issue", issue_key.upper()),
+            query,
+            max_results,
+            {"issueKey": issue_key},
         )
-        return to_markdown([u.raw for u in users])
+        return to_markdown(users)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to get assignable users: {e}")
 
@@ -250,10 +1814,11 @@ def get_assignable_users_for_issue(issue_key: str, query: str = "", max_results:
 def list_boards(max_results: int = 10, project_key_or_id: str = None) -> str:
     """List boards, optionally filtered by project."""
     try:
-        boards = get_jira_client(get_http_headers()).boards(
-            maxResults=max_results, projectKeyOrID=project_key_or_id
-        )
-        return to_markdown([b.raw for b in boards])
+        params = {"maxResults": max_results}
+        if project_key_or_id:
+            params["projectKeyOrId"] = project_key_or_id
+        boards = get_json(get_jira_client(get_http_headers()), "board", params, agile=True)
+        return to_markdown(boards["values"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch boards: {e}")
 
@@ -262,8 +1827,10 @@ def list_boards(max_results: int = 10, project_key_or_id: str = None) -> str:
 def list_sprints(board_id: int, max_results: int = 10) -> str:
     """List sprints for a board."""
     try:
-        sprints = get_jira_client(get_http_headers()).sprints(board_id, maxResults=max_results)
-        return to_markdown([s.raw for s in sprints])
+        client = get_jira_client(get_http_headers())
+        params = {"maxResults": max_results}
+        sprints = get_json(client, f"board/{board_id}/sprint", params, agile=True)
+        return to_markdown(sprints["values"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch sprints: {e}")
 
@@ -272,8 +1839,8 @@ def list_sprints(board_id: int, max_results: int = 10) -> str:
 def get_sprint(sprint_id: int) -> str:
     """Get sprint by ID."""
     try:
-        sprint = get_jira_client(get_http_headers()).sprint(sprint_id)
-        return to_markdown(sprint.raw)
+        client = get_jira_client(get_http_headers())
+        return to_markdown(get_json(client, f"sprint/{sprint_id}", agile=True))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to fetch sprint: {e}")
 
@@ -282,16 +1849,438 @@ def get_sprint(sprint_id: int) -> str:
 def get_sprints_by_name(board_id: int, state: str = None) -> str:
     """Get sprints by name for a board, optionally filtered by state."""
     try:
-        sprints = get_jira_client(get_http_headers()).sprints_by_name(board_id, state=state)
+        client = get_jira_client(get_http_headers())
+        params = {"state": state} if state else {}
+        sprints = {}
+        for sprint in iter_agile_values(client, f"board/{board_id}/sprint", params):
+            if sprint["name"] in sprints:
+                raise ValueError(
+                    f"Board {board_id} has more than one sprint named {sprint['name']}"
+                )
+            sprints[sprint["name"]] = sprint
         return to_markdown(sprints)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch sprints by name: {e}")
 
 
-# ─── 5. Write Operations ───────────────────────────────────────────────────────
+@mcp.tool()
+def sprint_report(board_id: int, sprint_id: int) -> str:
+    """
+    Summarize a sprint: issue counts by status, status category, assignee and
+    issue type, story points, and how much is done.
+
+    The sprint, board and issues are fetched concurrently and only the fields
+    needed for the summary are requested.
+    """
+    client = get_jira_client(get_http_headers())
+    points_field = field_registry.lookup("story_points", client)
+    fields = ["status", "assignee", "issuetype"] + ([points_field] if points_field else [])
+
+    (sprint, sprint_error), (board, board_error), (issues, issues_error) = map_concurrently(
+        lambda fetch: fetch(),
+        [
+            lambda: get_json(client, f"sprint/{sprint_id}", agile=True),
+            lambda: get_json(client, f"board/{board_id}", agile=True),
+            lambda: list(iter_search_raw(client, f"sprint = {sprint_id}", fields)),
+        ],
+    )
+    if error := sprint_error or board_error or issues_error:
+        raise HTTPException(status_code=404, detail=f"Failed to build sprint report: {error}")
+
+    by_status, by_category, by_assignee, by_type = {}, {}, {}, {}
+    points = {"total": 0, "done": 0, "unestimated_issues": 0}
+    done = 0
+    for issue in issues:
+        values = issue["fields"]
+        status = values.get("status") or {}
+        category = status.get("statusCategory") or {}
+        assignee = interned(values.get("assignee"), "displayName") or "Unassigned"
+        for counts, value in (
+            (by_status, status.get("name")),
+            (by_category, category.get("name")),
+            (by_assignee, assignee),
+            (by_type, interned(values.get("issuetype"))),
+        ):
+            counts[value] = counts.get(value, 0) + 1
+
+        is_done = category.get("key") == "done"
+        done += is_done
+        estimate = values.get(points_field) if points_field else None
+        # Some field configurations hold text, counted like a missing estimate
+        if not isinstance(estimate, (int, float)):
+            points["unestimated_issues"] += 1
+        else:
+            points["total"] += estimate
+            points["done"] += estimate if is_done else 0
+
+    return to_markdown(
+        {
+            "sprint": {
+                key: sprint.get(key)
+                for key in ("id", "name", "state", "startDate", "endDate", "goal")
+                if key in sprint
+            },
+            "board": {"id": board.get("id"), "name": board.get("name")},
+            "issues": len(issues),
+            "done": done,
+            "completion": round(done / len(issues), 3) if issues else None,
+            "story_points": {
+                **points,
+                "completion": (
+                    round(points["done"] / points["total"], 3) if points["total"] else None
+                ),
+            },
+            "by_status_category": by_category,
+            "by_status": by_status,
+            "by_assignee": by_assignee,
+            "by_issuetype": by_type,
+        }
+    )
+
+
+# Friendlier names accepted by aggregate_issues for Jira fields
+AGGREGATE_ALIASES = {
+    "type": "issuetype",
+    "component": "components",
+    "fixversion": "fixVersions",
+    "fixversions": "fixVersions",
+    "label": "labels",
+}
+AGGREGATE_METRICS = {"sum", "avg", "min", "max"}
+
+
+def field_values(value):
+    """Values of a raw field to group by, one per element for list fields."""
+    if value is None or value == []:
+        return [None]
+    values = []
+    for item in value if isinstance(value, list) else [value]:
+        if isinstance(item, dict):
+            item = next(
+                (item[k] for k in ("displayName", "name", "value", "key") if item.get(k)), None
+            )
+        values.append(item)
+    return values
+
+
+def aggregate_field_id(name, client):
+    """
+    Jira field for a name given to aggregate_issues: an alias, the output name
+    of a custom field of field_registry, or a field ID.
+    """
+    if name.lower() in AGGREGATE_ALIASES:
+        return AGGREGATE_ALIASES[name.lower()]
+    if name in field_registry.entries():
+        return field_registry.lookup(name, client) or name
+    return name
+
+
+def aggregate_field(name, client):
+    """Jira field to request and how to read group values from it."""
+    if name.lower() == "statuscategory":
+        return "status", lambda status: [status["statusCategory"]["name"] if status else None]
+    return aggregate_field_id(name, client), field_values
+
+
+@mcp.tool()
+def aggregate_issues(
+    jql: str, group_by: list[str], metrics: list[str] = None, max_groups: int = 50
+) -> str:
+    """
+    Count issues matching a JQL query grouped by fields, e.g. group_by=["status",
+    "assignee"], and return a small table instead of the issues themselves.
+
+    Group by any field: status, statusCategory, assignee, reporter, priority,
+    issuetype, resolution, project, components, labels, fixVersions, a
+    configured custom field such as story_points, or a field ID. Issues with
+    several components, labels or versions count in each of their groups.
+
+    'metrics' defaults to ["count"], and can also hold "sum:<field>",
+    "avg:<field>", "min:<field>" or "max:<field>" for numeric fields such as
+    "sum:story_points".
+
+    All matching issues are read, page by page, so counts are exact even for
+    very large result sets.
+    """
+    metrics = metrics or ["count"]
+    client = get_jira_client(get_http_headers())
+    groupings = [aggregate_field(name, client) for name in group_by]
+    # (operation, field) of every metric other than count
+    measured = []
+    for metric in metrics:
+        if metric == "count":
+            continue
+        op, _, field = metric.partition(":")
+        if op not in AGGREGATE_METRICS or not field:
+            raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+        measured.append((op, aggregate_field_id(field, client)))
+    fields = sorted({field for field, _ in groupings} | {field for _, field in measured})
+
+    # group key -> [count, then (sum, numbers seen, min, max) per measured field]
+    groups = {}
+    matched = 0
+
+    def add(issue):
+        raw_fields = issue["fields"]
+        keys = [()]
+        for field, values in groupings:
+            keys = [key + (value,) for key in keys for value in values(raw_fields.get(field))]
+        numbers = [raw_fields.get(field) for _, field in measured]
+        for key in keys:
+            totals = groups.setdefault(key, [0] + [[0, 0, None, None] for _ in measured])
+            totals[0] += 1
+            for total, number in zip(totals[1:], numbers):
+                if isinstance(number, (int, float)):
+                    total[0] += number
+                    total[1] += 1
+                    total[2] = number if total[2] is None else min(total[2], number)
+                    total[3] = number if total[3] is None else max(total[3], number)
+
+    try:
+        first = search_json(client, jql, fields)
+        page_size = len(first["issues"]) or SEARCH_PAGE_SIZE
+        for issue in first["issues"]:
+            add(issue)
+        matched += len(first["issues"])
+
+        # Fetch the remaining pages concurrently, a window at a time, so only a
+        # few pages are held in memory whatever the number of issues.
+        starts = list(range(page_size, first.get("total", 0), page_size))
+        for window in in_chunks(starts, JIRA_MAX_CONCURRENCY):
+            pages = map_concurrently(
+                lambda start: search_json(client, jql, fields, start, page_size),
+                window,
+            )
+            for page, error in pages:
+                if error:
+                    raise error
+                for issue in page["issues"]:
+                    add(issue)
+                matched += len(page["issues"])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Aggregation failed: {e}")
+
+    def metric_values(totals):
+        values = []
+        for (op, _), (total_sum, seen, low, high) in zip(measured, totals[1:]):
+            if op == "avg":
+                values.append(round(total_sum / seen, 2) if seen else None)
+            else:
+                values.append({"sum": total_sum, "min": low, "max": high}[op])
+        return iter(values)
+
+    rows = sorted(groups.items(), key=lambda item: -item[1][0])
+    lines = [
+        "| " + " | ".join(group_by + metrics) + " |",
+        "|" + " --- |" * (len(group_by) + len(metrics)),
+    ]
+    for key, totals in rows[:max_groups]:
+        cells = ["(none)" if value is None else str(value) for value in key]
+        values = metric_values(totals)
+        cells += [str(totals[0] if metric == "count" else next(values)) for metric in metrics]
+        lines.append("| " + " | ".join(cell.replace("|", "\\|") for cell in cells) + " |")
+    lines.append("")
+    lines.append(f"{matched} issues in {len(groups)} groups.")
+    if len(rows) > max_groups:
+        lines.append(f"Showing the {max_groups} largest groups, raise max_groups to see more.")
+    return "\n".join(lines)
+
+
+# ─── 7. Write Operations ───────────────────────────────────────────────────────
+
+# Keyed by (caller id, tool name, idempotency key), holding (arguments, result)
+idempotency_cache = TTLCache(JIRA_IDEMPOTENCY_TTL, JIRA_CACHE_MAX_ENTRIES)
+# Lock and number of waiting calls per idempotency cache key
+_idempotency_locks = {}
+_idempotency_locks_guard = threading.Lock()
+
+
+def idempotent(fn):
+    """
+    Make retries of a write tool safe. When called again with the same
+    idempotency_key by the same caller, the tool returns the first call's result
+    instead of writing to Jira again. A retry that arrives while the first call
+    is still running waits for it. Failed calls are not remembered.
+    """
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        if not (key := arguments.pop("idempotency_key")):
+            return fn(*args, **kwargs)
+
+        cache_key = (get_caller_id(get_http_headers()), fn.__name__, key)
+        fingerprint = json.dumps(arguments, sort_keys=True, default=str)
+        with _idempotency_locks_guard:
+            entry = _idempotency_locks.setdefault(cache_key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if (cached := idempotency_cache.get(cache_key)) is not None:
+                    if cached[0] != fingerprint:
+                        raise HTTPException(
+                            status_code=409,
+                            detail=f"idempotency_key {key} was already used with other arguments",
+                        )
+                    return cached[1]
+                result = fn(*args, **kwargs)
+                idempotency_cache.set(cache_key, (fingerprint, result))
+                return result
+        finally:
+            with _idempotency_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del _idempotency_locks[cache_key]
+
+    wrapper.__doc__ = (
+        f"{inspect.getdoc(fn)}\n\nPass the same idempotency_key when retrying, so the"
+        " change is only made once."
+    )
+    return wrapper
+
+
+def edit_issue(client, issue_key, fields=None, update=None):
+    """Set field values and apply update operations (e.g. adding labels) in one PUT."""
+    payload = {}
+    if fields:
+        payload["fields"] = fields
+    if update:
+        payload["update"] = update
+    client._session.put(client._get_url(f"issue/{issue_key}"), data=json.dumps(payload))
+
+
+class WriteBatch:
+    """Edits to one issue that are sent to Jira together."""
+
+    def __init__(self, after=None):
+        # Set when the previous batch or barrier for the issue has finished
+        self.after = after
+        self.fields = {}
+        self.update = {}
+        # Body for the assignee endpoint, used if the batch only changes the assignee
+        self.assignee = None
+        self.only_assignee = True
+        self.open = True
+        self.flush_now = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+
+    def accepts(self, fields, update):
+        # Jira rejects a field that is both set and updated in one request
+        return self.open and not (fields.keys() & self.update.keys() or update.keys() & self.fields)
+
+    def add(self, fields, update, assignee):
+        self.fields.update(fields)
+        for name, operations in update.items():
+            self.update.setdefault(name, []).extend(operations)
+        if assignee is None:
+            self.only_assignee = False
+        else:
+            self.assignee = assignee
+
+    def send(self, client, issue_key):
+        if self.only_assignee:
+            url = client._get_latest_url(f"issue/{issue_key}/assignee")
+            client._session.put(url, data=json.dumps(self.assignee))
+        else:
+            edit_issue(client, issue_key, self.fields, self.update)
+
+
+class IssueWriteQueue:
+    """
+    Per caller and issue queue that merges edits arriving within `window`
+    seconds into one request.
+
+    Field values set later win and update operations are applied in arrival
+    order, as if the edits had been sent one by one. Operations that cannot be
+    merged, such as transitions, run as barriers: after every earlier edit and
+    before every later one.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        # Latest batch or barrier per (caller id, issue key)
+        self._tails = {}
+        self._lock = threading.Lock()
+
+    def submit(self, client, caller, issue_key, fields=None, update=None, assignee=None):
+        """Edit an issue, returning once the request containing the edit was sent."""
+        fields = fields or {}
+        update = update or {}
+        key = (caller, issue_key.upper())
+        with self._lock:
+            tail = self._tails.get(key)
+            if tail is not None and tail.accepts(fields, update):
+                batch, leader = tail, False
+            else:
+                batch, leader = WriteBatch(tail.done if tail else None), True
+                self._tails[key] = batch
+            batch.add(fields, update, assignee)
+
+        if leader:
+            if self.window > 0:
+                batch.flush_now.wait(self.window)
+            with self._lock:
+                batch.open = False
+            try:
+                if batch.after:
+                    batch.after.wait()
+                batch.send(client, issue_key)
+            except Exception as e:
+                batch.error = e
+            finally:
+                self._finish(key, batch)
+        else:
+            batch.done.wait()
+        if batch.error:
+            raise batch.error
+
+    @contextmanager
+    def barrier(self, caller, issue_key):
+        """Run the enclosed operation after pending edits to the issue and before later ones."""
+        key = (caller, issue_key.upper())
+        with self._lock:
+            tail = self._tails.get(key)
+            barrier = WriteBatch(tail.done if tail else None)
+            barrier.open = False
+            self._tails[key] = barrier
+        if tail:
+            tail.flush_now.set()
+        try:
+            if barrier.after:
+                barrier.after.wait()
+            yield
+        finally:
+            self._finish(key, barrier)
+
+    def _finish(self, key, batch):
+        with self._lock:
+            batch.done.set()
+            if self._tails.get(key) is batch:
+                del self._tails[key]
+
+
+write_queue = IssueWriteQueue(JIRA_WRITE_COALESCE_WINDOW)
+
+
+def queue_assignment(client, issue_key, assignee):
+    """Set the assignee, or clear it if assignee is None, through the write queue."""
+    user_id = client._get_user_id(assignee)
+    payload = {"accountId": user_id} if client._is_cloud else {"name": user_id}
+    write_queue.submit(
+        client,
+        get_caller_id(get_http_headers()),
+        issue_key,
+        fields={"assignee": payload if user_id else None},
+        assignee=payload,
+    )
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
+@idempotent
 def create_issue(
     project_key: str,
     summary: str,
@@ -299,6 +2288,7 @@ def create_issue(
     issue_type: str = "Task",
     priority: str = "Medium",
     assignee: str = None,
+    idempotency_key: str = None,
 ) -> str:
     """Create a new Jira issue."""
     try:
@@ -313,23 +2303,28 @@ def create_issue(
         if assignee:
             issue_dict["assignee"] = {"name": assignee}
 
-        new_issue = get_jira_client(get_http_headers()).create_issue(fields=issue_dict)
+        # Without prefetch the created issue is not fetched again, only its key is used
+        new_issue = get_jira_client(get_http_headers()).create_issue(
+            fields=issue_dict, prefetch=False
+        )
+        invalidate_issue(new_issue.key)
         return f"Created issue {new_issue.key}: {summary}"
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to create issue: {e}")
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
+@idempotent
 def update_issue(
     issue_key: str,
     summary: str = None,
     description: str = None,
     priority: str = None,
     assignee: str = None,
+    idempotency_key: str = None,
 ) -> str:
     """Update an existing Jira issue."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
         update_dict = {}
 
         if summary:
@@ -342,7 +2337,10 @@ def update_issue(
             update_dict["assignee"] = {"name": assignee}
 
         if update_dict:
-            issue.update(fields=update_dict)
+            client = get_jira_client(get_http_headers())
+            caller = get_caller_id(get_http_headers())
+            write_queue.submit(client, caller, issue_key, fields=update_dict)
+            invalidate_issue(issue_key)
             return f"Updated issue {issue_key} successfully"
         else:
             return f"No updates provided for issue {issue_key}"
@@ -351,22 +2349,25 @@ def update_issue(
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def add_comment(issue_key: str, comment_body: str) -> str:
+@idempotent
+def add_comment(issue_key: str, comment_body: str, idempotency_key: str = None) -> str:
     """Add a comment to a Jira issue."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        comment = get_jira_client(get_http_headers()).add_comment(issue, comment_body)
+        comment = get_jira_client(get_http_headers()).add_comment(issue_key, comment_body)
+        invalidate_issue(issue_key)
         return f"Added comment to {issue_key}: {comment.id}"
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to add comment to {issue_key}: {e}")
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def delete_comment(issue_key: str, comment_id: str) -> str:
+@idempotent
+def delete_comment(issue_key: str, comment_id: str, idempotency_key: str = None) -> str:
     """Delete a comment from a Jira issue."""
     try:
-        comment = get_jira_client(get_http_headers()).comment(issue_key, comment_id)
-        comment.delete()
+        client = get_jira_client(get_http_headers())
+        client._session.delete(client._get_url(f"issue/{issue_key}/comment/{comment_id}"))
+        invalidate_issue(issue_key)
         return f"Deleted comment {comment_id} from {issue_key}"
     except Exception as e:
         raise HTTPException(
@@ -378,82 +2379,367 @@ def delete_comment(issue_key: str, comment_id: str) -> str:
 @mcp.tool()
 def get_issue_comments(issue_key: str) -> str:
     """Get all comments for a Jira issue."""
-
-    def simplify_comment(comment):
-        return {
-            "id": comment.id,
-            "author": comment.author.displayName if comment.author else "Unknown",
-            "body": comment.body,
-            "created": comment.created,
-            "updated": (comment.updated if hasattr(comment, "updated") else comment.created),
-        }
+    caller = get_caller_id(get_http_headers())
+    if (cached := comment_cache.get((caller, issue_key.upper()))) is not None:
+        return to_markdown(cached)
 
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        return to_markdown((simplify_comment(c) for c in issue.fields.comment.comments))
+        client = get_jira_client(get_http_headers())
+        # The other fields are only needed to update the store with the issue
+        fields = ["comment"]
+        if issue_store:
+            fields = issue_fields(field_registry.resolve(client)) + fields
+        raw = get_json(client, f"issue/{issue_key}", {"fields": ",".join(fields)})
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to get comments for {issue_key}: {e}")
 
+    if issue_store:
+        issue_store.upsert([raw])
+    comments = [simplify_comment(c) for c in raw["fields"]["comment"]["comments"]]
+    if caller:
+        comment_cache.set((caller, issue_key.upper()), comments)
+    return to_markdown(comments)
+
+
+@mcp.tool()
+def fulltext_search(query: str, max_results: int = 20) -> str:
+    """
+    Full-text search of issue summaries, descriptions and comments in the local
+    issue store, ranked by relevance, without contacting Jira.
+
+    Only covers mirrored projects and issues previously fetched by other tools.
+    Words must all match; use "double quotes" for phrases and a trailing * for prefixes.
+    """
+    if not issue_store:
+        raise HTTPException(
+            status_code=400, detail="Full-text search requires the local issue store"
+        )
+    return to_markdown(issue_store.fulltext_search(query, max_results))
+
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def assign_issue(issue_key: str, assignee: str) -> str:
+@idempotent
+def assign_issue(issue_key: str, assignee: str, idempotency_key: str = None) -> str:
     """Assign a Jira issue to a user."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        get_jira_client(get_http_headers()).assign_issue(issue, assignee)
+        queue_assignment(get_jira_client(get_http_headers()), issue_key, assignee)
+        invalidate_issue(issue_key)
         return f"Assigned issue {issue_key} to {assignee}"
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to assign issue {issue_key}: {e}")
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def unassign_issue(issue_key: str) -> str:
+@idempotent
+def unassign_issue(issue_key: str, idempotency_key: str = None) -> str:
     """Unassign a Jira issue."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        get_jira_client(get_http_headers()).assign_issue(issue, None)
+        queue_assignment(get_jira_client(get_http_headers()), issue_key, None)
+        invalidate_issue(issue_key)
         return f"Unassigned issue {issue_key}"
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to unassign issue {issue_key}: {e}")
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def transition_issue(issue_key: str, transition_name: str, comment: str = None) -> str:
+@idempotent
+def transition_issue(
+    issue_key: str, transition_name: str, comment: str = None, idempotency_key: str = None
+) -> str:
     """Transition a Jira issue to a new status."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        transitions = get_jira_client(get_http_headers()).transitions(issue)
+        client = get_jira_client(get_http_headers())
+        with write_queue.barrier(get_caller_id(get_http_headers()), issue_key):
+            transitions = client.transitions(issue_key)
+
+            # Find the transition by name
+            transition_id = None
+            for trans in transitions:
+                if trans["name"].lower() == transition_name.lower():
+                    transition_id = trans["id"]
+                    break
+
+            if not transition_id:
+                available_transitions = [t["name"] for t in transitions]
+                return f"Transition '{transition_name}' not found. Available transitions: {', '.join(available_transitions)}"
+
+            # Perform the transition
+            if comment:
+                client.transition_issue(issue_key, transition_id, comment=comment)
+                invalidate_issue(issue_key)
+                return f"Transitioned issue {issue_key} to '{transition_name}' with comment"
+            else:
+                client.transition_issue(issue_key, transition_id)
+                invalidate_issue(issue_key)
+                return f"Transitioned issue {issue_key} to '{transition_name}'"
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to transition issue {issue_key}: {e}")
 
-        # Find the transition by name
-        transition_id = None
-        for trans in transitions:
-            if trans["name"].lower() == transition_name.lower():
-                transition_id = trans["id"]
-                break
 
-        if not transition_id:
-            available_transitions = [t["name"] for t in transitions]
-            return f"Transition '{transition_name}' not found. Available transitions: {', '.join(available_transitions)}"
+def parse_since(since, now=None):
+    """
+    Convert a relative offset such as -2d or -30m, or an ISO 8601 date or
+    timestamp (UTC unless it has an offset), to epoch seconds.
+    """
+    now = now if now is not None else time.time()
+    if match := JqlQuery.RELATIVE_DATE.match(since.strip()):
+        sign, amount, unit = match.groups()
+        offset = int(amount) * JqlQuery.UNIT_SECONDS[unit.lower()]
+        return now - offset if sign == "-" else now + offset
+    moment = datetime.fromisoformat(since.strip())
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def fetch_changes(client, issue_key, since_ts):
+    """
+    Return the changelog items of an issue made at or after since_ts, oldest first.
+
+    The changelog is read with the issue, then any remaining pages are fetched
+    from the paginated changelog endpoint.
+    """
+    data = get_json(client, f"issue/{issue_key}", {"fields": "created", "expand": "changelog"})
+    changelog = data.get("changelog", {})
+    histories = list(changelog.get("histories", []))
+    while len(histories) < changelog.get("total", 0):
+        page = get_json(
+            client, f"issue/{issue_key}/changelog", {"startAt": len(histories), "maxResults": 100}
+        )
+        if not page.get("values"):
+            break
+        histories.extend(page["values"])
+
+    changes = []
+    for history in histories:
+        if parse_jira_datetime(history["created"]) < since_ts:
+            continue
+        author = history.get("author") or {}
+        changes.extend(
+            {
+                "at": history["created"],
+                "author": author.get("displayName", "Unknown"),
+                "field": item.get("field"),
+                "from": item.get("fromString"),
+                "to": item.get("toString"),
+            }
+            for item in history.get("items", [])
+        )
+    changes.sort(key=lambda change: parse_jira_datetime(change["at"]))
+    return changes
+
+
+@mcp.tool()
+def get_issue_changes(issue_key: str, since: str = "-1d") -> str:
+    """
+    Get what changed on a Jira issue since a point in time, as a compact list of
+    field changes (time, author, field, from, to).
+
+    'since' is a relative offset such as -2h, -3d or -1w, or an ISO 8601 date or
+    timestamp (UTC unless an offset is given).
+    """
+    try:
+        since_ts = parse_since(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid since value: {since}")
+    try:
+        changes = fetch_changes(get_jira_client(get_http_headers()), issue_key, since_ts)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Failed to get changes for {issue_key}: {e}")
+    return to_markdown({"key": issue_key, "changes": changes})
+
+
+@mcp.tool()
+def get_issues_changes(jql: str, since: str = "-1d", max_issues: int = 50) -> str:
+    """
+    Get what changed since a point in time on each issue matching a JQL query.
+
+    Only issues updated since then are looked at, and their changelogs are
+    fetched concurrently. 'since' is interpreted as in get_issue_changes.
+    """
+    try:
+        since_ts = parse_since(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid since value: {since}")
+
+    # Relative minutes avoid depending on the Jira user's timezone
+    minutes = max(int((time.time() - since_ts) // 60) + 1, 1)
+    where, order_by = re.match(r"(?is)^(.*?)\s*(\bORDER\s+BY\b.*)?$", jql.strip()).groups()
+    query = f'({where}) AND updated >= "-{minutes}m"' if where else f'updated >= "-{minutes}m"'
+    if order_by:
+        query += f" {order_by}"
+
+    client = get_jira_client(get_http_headers())
+    try:
+        found = search_json(client, query, "key", max_results=max_issues)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"JQL search failed: {e}")
+
+    keys = [issue["key"] for issue in found.get("issues", [])]
+    results = map_concurrently(lambda key: fetch_changes(client, key, since_ts), keys)
+    result = to_markdown(
+        [
+            {"key": key, "error": str(error)} if error else {"key": key, "changes": changes}
+            for key, (changes, error) in zip(keys, results)
+            if error or changes
+        ]
+    )
+    total = found.get("total", len(keys))
+    if total > len(keys):
+        result += (
+            f"\n\n_Looked at {len(keys)} of {total} updated issues,"
+            " raise max_issues or narrow the query to see the others._"
+        )
+    return result
+
 
-        # Perform the transition
-        if comment:
-            get_jira_client(get_http_headers()).transition_issue(
-                issue, transition_id, comment=comment
+# Fields fetched for each issue in get_issue_tree, besides those of issue_fields
+TREE_FIELDS = ["parent", "issuelinks"]
+TREE_INCLUDES = {"comments", "links"}
+
+# Issue keys per JQL 'key in (...)' or 'parent in (...)' query
+KEYS_PER_QUERY = 100
+
+
+def in_chunks(items, size=KEYS_PER_QUERY):
+    items = list(items)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def issue_links(issue):
+    """
+    (relation, linked issue) pairs of a raw issue's links, e.g. ("blocks", {"id":
+    "10001", "key": "KEY-1", ...}).
+    """
+    for link in issue["fields"].get("issuelinks") or []:
+        if other := link.get("outwardIssue"):
+            yield link["type"]["outward"], other
+        elif other := link.get("inwardIssue"):
+            yield link["type"]["inward"], other
+
+
+@mcp.tool()
+def get_issue_tree(
+    root_key: str,
+    depth: int = 2,
+    include: list[str] = None,
+    max_issues: int = 200,
+    max_output_chars: int = None,
+) -> str:
+    """
+    Get an issue and the issues below it: epic children and subtasks, level by
+    level down to 'depth'. 'include' can contain "links" to also follow issue
+    links and "comments" to add the comments of every issue.
+
+    Each level is fetched with one JQL query (per 100 issues), so large trees
+    take a few requests. Every issue appears once, with the depth, the issue it
+    was reached from and how. Stops after 'max_issues' issues.
+    """
+    include = set(include or [])
+    if unknown := include - TREE_INCLUDES:
+        raise HTTPException(status_code=400, detail=f"Unknown include values: {sorted(unknown)}")
+
+    client = get_jira_client(get_http_headers())
+    nodes = {}
+    truncated = False
+
+    def visit(issue, level, parent, relation):
+        nonlocal truncated
+        if issue["key"] in nodes:
+            return False
+        if len(nodes) >= max_issues:
+            truncated = True
+            return False
+        nodes[issue["key"]] = {
+            "depth": level,
+            "parent": parent,
+            "relation": relation,
+            **IssueRecord.from_raw(issue, custom_fields).as_dict(),
+        }
+        if "links" in include:
+            nodes[issue["key"]]["links"] = [
+                {"relation": relation, "key": other["key"]}
+                for relation, other in issue_links(issue)
+            ]
+        return True
+
+    try:
+        # None on instances without an "Epic Link" field (Jira Cloud)
+        epic_field = field_registry.field_id("Epic Link", client)
+        custom_fields = field_registry.resolve(client)
+        fields = issue_fields(custom_fields) + TREE_FIELDS + ([epic_field] if epic_field else [])
+        roots = search_json(client, f"key = {root_key}", fields, max_results=1)["issues"]
+        if not roots:
+            raise HTTPException(status_code=404, detail=f"Issue {root_key} not found")
+        visit(roots[0], 0, None, "root")
+        frontier = list(roots)
+
+        for level in range(1, depth + 1):
+            if not frontier or truncated:
+                break
+            next_frontier = []
+            for keys in in_chunks(issue["key"] for issue in frontier):
+                key_list = ", ".join(keys)
+                jql = f"parent in ({key_list})"
+                if epic_field:
+                    jql += f' OR "Epic Link" in ({key_list})'
+                for child in iter_search_raw(client, jql, fields):
+                    parent = child["fields"].get("parent")
+                    if parent and parent["key"] in keys:
+                        parent_key, relation = parent["key"], "child"
+                    else:
+                        parent_key, relation = child["fields"].get(epic_field), "epic child"
+                    if visit(child, level, parent_key, relation):
+                        next_frontier.append(child)
+
+            if "links" in include:
+                linked = {}
+                linked_ids = {}
+                for issue in frontier:
+                    for relation, other in issue_links(issue):
+                        if other["key"] not in nodes:
+                            linked.setdefault(other["key"], (issue["key"], relation))
+                            linked_ids.setdefault(other.get("id"), other["key"])
+                for keys in in_chunks(linked):
+                    jql = f"key in ({', '.join(keys)})"
+                    for issue in iter_search_raw(client, jql, fields):
+                        # Moved issues come back under their new key, so match their id
+                        key = (
+                            issue["key"]
+                            if issue["key"] in linked
+                            else linked_ids.get(issue.get("id"))
+                        )
+                        if visit(issue, level, *linked.get(key, (None, "link"))):
+                            next_frontier.append(issue)
+
+            frontier = next_frontier
+
+        if "comments" in include:
+            results = map_concurrently(
+                lambda key: get_json(client, f"issue/{key}/comment")["comments"], list(nodes)
             )
-            return f"Transitioned issue {issue_key} to '{transition_name}' with comment"
-        else:
-            get_jira_client(get_http_headers()).transition_issue(issue, transition_id)
-            return f"Transitioned issue {issue_key} to '{transition_name}'"
+            for node, (comments, error) in zip(nodes.values(), results):
+                node["comments"] = (
+                    [simplify_comment(c) for c in comments]
+                    if not error
+                    else f"Failed to fetch comments: {error}"
+                )
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to transition issue {issue_key}: {e}")
+        raise HTTPException(status_code=400, detail=f"Failed to get issue tree of {root_key}: {e}")
+
+    result = budgeted_markdown(nodes.values(), max_output_chars)
+    if truncated:
+        result += f"\n\n_Stopped after {max_issues} issues, raise max_issues to see more._"
+    return result
 
 
 @mcp.tool()
 def get_issue_transitions(issue_key: str) -> str:
     """Get available transitions for a Jira issue."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        transitions = get_jira_client(get_http_headers()).transitions(issue)
+        transitions = get_jira_client(get_http_headers()).transitions(issue_key)
         transition_list = [{"id": t["id"], "name": t["name"]} for t in transitions]
         return to_markdown(transition_list)
     except Exception as e:
@@ -462,38 +2748,288 @@ def get_issue_transitions(issue_key: str) -> str:
         )
 
 
+# Bytes read from Jira at a time when streaming attachment content
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+
+
+class AttachmentCache:
+    """
+    Content-addressed directory of downloaded attachments.
+
+    Files are stored under objects/ by the SHA-256 of their content, and ids/
+    maps attachment ids to those hashes. Jira attachments never change, so a
+    stored file stays valid for as long as the attachment exists. Callers must
+    still fetch the attachment metadata with their own token before reading,
+    so the cache never serves files a caller cannot see in Jira.
+
+    Attachments larger than max_file_bytes are not downloaded. Once the stored
+    files exceed max_bytes, the least recently read ones are deleted; reads
+    touch a file's modification time to mark it used.
+    """
+
+    # Partial downloads older than this are left over from a crash
+    STALE_DOWNLOAD_SECONDS = 3600
+
+    def __init__(self, directory, max_bytes, max_file_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        for name in ("objects", "ids", "tmp"):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+        self._downloading = set()
+        self._lock = threading.Lock()
+        self.remove_stale_downloads()
+
+    def remove_stale_downloads(self):
+        """Delete partial downloads left in tmp/ by a crash."""
+        cutoff = time.time() - self.STALE_DOWNLOAD_SECONDS
+        for entry in os.scandir(os.path.join(self.directory, "tmp")):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def path(self, attachment):
+        """Path of the stored content of an attachment, or None if not stored."""
+        id_path = os.path.join(self.directory, "ids", str(attachment["id"]))
+        try:
+            with open(id_path) as f:
+                path = os.path.join(self.directory, "objects", f.read().strip())
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # The file was evicted
+            os.unlink(id_path)
+            return None
+        if os.path.getsize(path) == attachment["size"]:
+            return path
+        return None
+
+    def store(self, client, attachment):
+        """Stream an attachment to disk chunk by chunk, hashing it on the way."""
+        digest = hashlib.sha256()
+        tmp_dir = os.path.join(self.directory, "tmp")
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as f:
+            try:
+                with closing(client._session.get(attachment["content"], stream=True)) as response:
+                    for chunk in response.iter_content(ATTACHMENT_CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        sha = digest.hexdigest()
+        os.replace(f.name, os.path.join(self.directory, "objects", sha))
+        id_path = os.path.join(self.directory, "ids", str(attachment["id"]))
+        with tempfile.NamedTemporaryFile("w", dir=tmp_dir, delete=False) as f:
+            f.write(sha)
+        os.replace(f.name, id_path)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently read files until the total fits in max_bytes."""
+        objects = os.path.join(self.directory, "objects")
+        with self._lock:
+            files = []
+            for entry in os.scandir(objects):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                os.unlink(path)
+                total -= size
+
+    def store_in_background(self, client, attachment):
+        """
+        Download an attachment in a daemon thread, unless it is too large or that
+        is already happening.
+        """
+        if attachment["size"] > self.max_file_bytes:
+            return
+        with self._lock:
+            if attachment["id"] in self._downloading:
+                return
+            self._downloading.add(attachment["id"])
+
+        def run():
+            try:
+                self.store(client, attachment)
+            except Exception:
+                logger.exception("Failed to cache attachment %s", attachment["id"])
+            finally:
+                with self._lock:
+                    self._downloading.discard(attachment["id"])
+
+        threading.Thread(target=run, name="jira-attachment-cache", daemon=True).start()
+
+
+attachment_cache = (
+    AttachmentCache(
+        JIRA_ATTACHMENT_CACHE_DIR,
+        JIRA_ATTACHMENT_CACHE_MAX_BYTES,
+        JIRA_ATTACHMENT_CACHE_MAX_FILE_BYTES,
+    )
+    if JIRA_ATTACHMENT_CACHE_DIR
+    else None
+)
+
+
+def parse_byte_range(byte_range, size):
+    """
+    Start and end (exclusive) offsets of an HTTP style byte range: "start-end"
+    (inclusive), "start-" for the rest of the file or "-N" for the last N bytes.
+    """
+    match = re.fullmatch(r"\s*(\d*)\s*-\s*(\d*)\s*", byte_range or "0-")
+    if not match or match.groups() == ("", ""):
+        raise ValueError(f"Invalid byte range: {byte_range}")
+    first, last = match.groups()
+    if not first:
+        return max(size - int(last), 0), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start > end or (start == end and start > 0):
+        raise ValueError(f"Byte range {byte_range} is outside the {size} byte attachment")
+    return start, end
+
+
+def stream_range(client, url, start, end):
+    """
+    Read bytes start to end (exclusive) of a URL in chunks, asking for only that
+    range. Servers that ignore the Range header are read up to end and the
+    leading bytes dropped as they arrive.
+    """
+    if end <= start:
+        return b""
+    headers = {"Range": f"bytes={start}-{end - 1}"}
+    with closing(client._session.get(url, headers=headers, stream=True)) as response:
+        skip = 0 if response.status_code == 206 else start
+        wanted = end - start
+        chunks = []
+        for chunk in response.iter_content(ATTACHMENT_CHUNK_SIZE):
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk = chunk[dropped:]
+                skip -= dropped
+            chunks.append(chunk[:wanted])
+            wanted -= len(chunks[-1])
+            if not wanted:
+                break
+    return b"".join(chunks)
+
+
+@mcp.tool()
+def list_attachments(issue_key: str) -> str:
+    """List the attachments of a Jira issue with their ids, names, sizes and types."""
+    try:
+        client = get_jira_client(get_http_headers())
+        issue = get_json(client, f"issue/{issue_key}", {"fields": "attachment"})
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Failed to list attachments: {e}")
+    return to_markdown(
+        [
+            {
+                "id": a["id"],
+                "filename": a.get("filename"),
+                "size": a.get("size"),
+                "mimeType": a.get("mimeType"),
+                "created": a.get("created"),
+                "author": (a.get("author") or {}).get("displayName"),
+            }
+            for a in issue["fields"].get("attachment") or []
+        ]
+    )
+
+
+@mcp.tool()
+def get_attachment(attachment_id: str, max_bytes: int = 65536, byte_range: str = None) -> str:
+    """
+    Read the content of an attachment, such as a log file, up to max_bytes.
+
+    byte_range selects part of the file: "1000-1999", "5000-" to start at an
+    offset, or "-20000" for the last 20000 bytes. Only the requested bytes are
+    downloaded, so large files can be read piece by piece.
+    """
+    try:
+        client = get_jira_client(get_http_headers())
+        attachment = get_json(client, f"attachment/{attachment_id}")
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Failed to fetch attachment: {e}")
+    size = attachment["size"]
+    try:
+        start, end = parse_byte_range(byte_range, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    end = min(end, start + max(min(max_bytes, JIRA_MAX_ATTACHMENT_BYTES), 0))
+
+    try:
+        if attachment_cache and (path := attachment_cache.path(attachment)):
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+        else:
+            data = stream_range(client, attachment["content"], start, end)
+            if attachment_cache:
+                attachment_cache.store_in_background(client, attachment)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to download attachment: {e}")
+
+    header = f"# {attachment['filename']} ({attachment.get('mimeType')}, {size} bytes)\n\n"
+    if data:
+        header += f"Bytes {start}-{start + len(data) - 1}:\n\n"
+    if b"\0" in data[:ATTACHMENT_CHUNK_SIZE]:
+        body = f"Binary content, base64 encoded:\n\n{base64.b64encode(data).decode()}"
+    else:
+        body = f"```\n{data.decode('utf-8', errors='replace')}\n```"
+    result = header + body
+    if start + len(data) < size:
+        result += f'\n\n_Continue with byte_range="{start + len(data)}-"._'
+    return result
+
+
 @mcp.tool(enabled=ENABLE_WRITE)
-def delete_issue(issue_key: str) -> str:
+@idempotent
+def delete_issue(issue_key: str, idempotency_key: str = None) -> str:
     """Delete a Jira issue (use with caution)."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        issue.delete()
-        return f"Deleted issue {issue_key}"
+        client = get_jira_client(get_http_headers())
+        with write_queue.barrier(get_caller_id(get_http_headers()), issue_key):
+            client._session.delete(client._get_url(f"issue/{issue_key}"))
+            invalidate_issue(issue_key)
+            return f"Deleted issue {issue_key}"
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to delete issue {issue_key}: {e}")
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def add_issue_labels(issue_key: str, labels: list) -> str:
+@idempotent
+def add_issue_labels(issue_key: str, labels: list, idempotency_key: str = None) -> str:
     """Add labels to a Jira issue."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        current_labels = list(issue.fields.labels)
-        new_labels = list(set(current_labels + labels))  # Remove duplicates
-        issue.update(fields={"labels": new_labels})
+        client = get_jira_client(get_http_headers())
+        caller = get_caller_id(get_http_headers())
+        operations = [{"add": label} for label in labels]
+        write_queue.submit(client, caller, issue_key, update={"labels": operations})
+        invalidate_issue(issue_key)
         return f"Added labels {labels} to issue {issue_key}"
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to add labels to {issue_key}: {e}")
 
 
 @mcp.tool(enabled=ENABLE_WRITE)
-def remove_issue_labels(issue_key: str, labels: list) -> str:
+@idempotent
+def remove_issue_labels(issue_key: str, labels: list, idempotency_key: str = None) -> str:
     """Remove labels from a Jira issue."""
     try:
-        issue = get_jira_client(get_http_headers()).issue(issue_key)
-        current_labels = list(issue.fields.labels)
-        new_labels = [label for label in current_labels if label not in labels]
-        issue.update(fields={"labels": new_labels})
+        client = get_jira_client(get_http_headers())
+        caller = get_caller_id(get_http_headers())
+        operations = [{"remove": label} for label in labels]
+        write_queue.submit(client, caller, issue_key, update={"labels": operations})
+        invalidate_issue(issue_key)
         return f"Removed labels {labels} from issue {issue_key}"
     except Exception as e:
         raise HTTPException(
@@ -501,7 +3037,173 @@ def remove_issue_labels(issue_key: str, labels: list) -> str:
         )
 
 
-# ─── 6. Utility functions ─────────────────────────────────────────────────────
+# Read tools the batch tool can run, by name. Tools that fan out to their own
+# threads are left out, so a batch stays within JIRA_MAX_CALLS_PER_CALLER.
+BATCH_TOOLS = {
+    tool.name: tool
+    for tool in (
+        get_jira,
+        search_issues,
+        fulltext_search,
+        get_issue_changes,
+        get_issue_comments,
+        get_issue_transitions,
+        list_attachments,
+        get_attachment,
+        list_projects,
+        get_project,
+        get_project_components,
+        get_project_versions,
+        get_project_roles,
+        get_project_permission_scheme,
+        get_project_issue_types,
+        list_boards,
+        list_sprints,
+        get_sprint,
+        get_sprints_by_name,
+        search_users,
+        get_user,
+        get_current_user,
+        get_assignable_users_for_project,
+        get_assignable_users_for_issue,
+    )
+}
+BATCH_MAX_CALLS = 20
+
+
+@mcp.tool()
+def batch(calls: list[dict]) -> str:
+    """
+    Run several read tools in one request, e.g. calls=[{"tool": "get_current_user"},
+    {"tool": "get_project", "args": {"project_key": "KEY"}}].
+
+    Up to JIRA_MAX_CALLS_PER_CALLER calls run at a time with the same Jira
+    client, and the output of each is returned in order under its own
+    heading. A failed call reports its error without stopping the others.
+    Write tools and tools that run their own concurrent requests
+    (get_issues_changes, get_issue_tree, aggregate_issues, sprint_report)
+    can't be batched.
+    """
+    if not calls or len(calls) > BATCH_MAX_CALLS:
+        raise HTTPException(
+            status_code=400, detail=f"A batch takes between 1 and {BATCH_MAX_CALLS} calls"
+        )
+    client = get_jira_client(get_http_headers())
+
+    def run(call):
+        tool = BATCH_TOOLS.get(call.get("tool"))
+        if tool is None:
+            raise HTTPException(status_code=400, detail=f"Not a batchable tool: {call.get('tool')}")
+        batch_client.set(client)
+        # Validated and converted like the arguments of a direct call
+        return get_cached_typeadapter(tool.fn).validate_python(call.get("args") or {})
+
+    # Each call runs in a copy of this context, so it sees the request headers
+    contexts = [contextvars.copy_context() for _ in calls]
+    results = map_concurrently(
+        lambda item: item[0].run(run, item[1]), zip(contexts, calls), JIRA_MAX_CALLS_PER_CALLER
+    )
+
+    sections = []
+    for n, (call, (result, error)) in enumerate(zip(calls, results), 1):
+        if error is None:
+            sections.append(f"## {n}. {call.get('tool')}\n\n{result}")
+        else:
+            detail = error.detail if isinstance(error, HTTPException) else error
+            sections.append(f"## {n}. {call.get('tool')} failed\n\n{detail}")
+    return "\n\n".join(sections)
+
+
+# ─── 8. Webhook receiver ───────────────────────────────────────────────────────
+#    In HTTP mode Jira can push issue and comment events to
+#    /webhook/jira?secret=JIRA_WEBHOOK_SECRET, which are applied to the caches
+#    right away instead of waiting for entries to expire.
+
+
+def apply_webhook_event(event):
+    """
+    Apply a Jira webhook event to the caches and return the issue key it concerns.
+    Raises ValueError for malformed events.
+    """
+    if not isinstance(event, dict):
+        raise ValueError("Expected a JSON object")
+    name = event.get("webhookEvent", "")
+    raw_issue = event.get("issue") or {}
+    issue_key = raw_issue.get("key")
+    if not issue_key:
+        return None
+
+    if name in ("jira:issue_created", "jira:issue_updated"):
+        record = IssueRecord.from_raw(raw_issue)
+        # Only refresh copies callers already hold, they are known to have access
+        for key in cached_issue_keys(issue_cache, issue_key):
+            issue_cache.set(key, record)
+        search_cache.clear()
+        if issue_store:
+            issue_store.upsert([raw_issue])
+
+    elif name == "jira:issue_deleted":
+        invalidate_issue(issue_key, stale=False)
+        if issue_store:
+            issue_store.delete(issue_key)
+
+    elif name in ("comment_created", "comment_updated", "comment_deleted"):
+        comment = event.get("comment")
+        if not isinstance(comment, dict) or "id" not in comment:
+            raise ValueError(f"{name} event without a comment id")
+        simplified = simplify_comment(comment)
+        # Comments restricted to a role or group may be hidden from some callers
+        restricted = bool(comment.get("visibility"))
+        for key in cached_issue_keys(comment_cache, issue_key):
+            comments = comment_cache.get(key)
+            if comments is None:
+                continue
+            if restricted and name != "comment_deleted":
+                comment_cache.pop(key)
+                continue
+            if name == "comment_created":
+                comments = comments + [simplified]
+            elif name == "comment_updated":
+                comments = [simplified if c["id"] == comment["id"] else c for c in comments]
+            else:
+                comments = [c for c in comments if c["id"] != comment["id"]]
+            comment_cache.set(key, comments)
+        if issue_store:
+            issue_store.delete_comment(issue_key, comment["id"])
+            if name != "comment_deleted" and not restricted:
+                issue_store.add_comment(issue_key, comment)
+
+    return issue_key
+
+
+def replay_webhook_events(path):
+    """Apply webhook events recorded one JSON object per line, returns the count."""
+    count = 0
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                apply_webhook_event(json.loads(line))
+                count += 1
+    return count
+
+
+@mcp.custom_route("/webhook/jira", methods=["POST"])
+async def jira_webhook(request: Request) -> JSONResponse:
+    secret = request.query_params.get("secret", "").encode()
+    if not JIRA_WEBHOOK_SECRET or not hmac.compare_digest(secret, JIRA_WEBHOOK_SECRET.encode()):
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    try:
+        event = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    try:
+        issue_key = apply_webhook_event(event)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"issue": issue_key})
+
+
+# ─── 9. Utility functions ─────────────────────────────────────────────────────
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -549,7 +3251,7 @@ Examples:
     return parser.parse_args()
 
 
-# ─── 7. Run the MCP server  ───────────────────────────────
+# ─── 10. Run the MCP server  ──────────────────────────────
 
 if __name__ == "__main__":
     args = parse_arguments()
@@ -557,6 +3259,10 @@ if __name__ == "__main__":
     if args.transport == "stdio":
         if not all([JIRA_URL, JIRA_API_TOKEN]):
             raise RuntimeError("Missing JIRA_URL or JIRA_API_TOKEN environment variables")
+        if issue_store:
+            issue_store.start_background_sync(jira_client)
+        if user_directory.enabled and JIRA_CACHE_PROJECTS:
+            user_directory.start_background_refresh(jira_client, JIRA_CACHE_PROJECTS)
         mcp.run(transport=args.transport)
     else:
         if not JIRA_URL:
@@ -566,4 +3272,7 @@ if __name__ == "__main__":
         # shared token that everyone who can access the server can use.
         JIRA_API_TOKEN = None
         jira_client = None
+        # For the same reason the issue store is not used, since it would serve
+        # issues to callers regardless of their own Jira permissions.
+        issue_store = None
         mcp.run(transport=args.transport, host=args.host, port=args.port)
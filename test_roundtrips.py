@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+"""
+Round-trip budgets: the Jira requests, client constructions and bytes each
+tool costs, measured against a recording fake Jira in stdio and HTTP modes.
+
+The budgets are kept in fixtures/roundtrip_budgets.json and any difference
+fails the test. After a change that is meant to alter them, rewrite the table
+with:
+
+    UPDATE_ROUNDTRIP_BUDGETS=1 python -m pytest test_roundtrips.py
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import jira
+import pytest
+
+# Set up required environment variables before importing server module
+os.environ.setdefault("JIRA_URL", "https://test.example.com")
+os.environ.setdefault("JIRA_API_TOKEN", "test-token")
+
+# Mock JIRA client creation before importing server module
+with patch("jira.JIRA"):
+    import server
+
+BUDGETS_PATH = Path(__file__).parent / "fixtures" / "roundtrip_budgets.json"
+UPDATE_BUDGETS = os.getenv("UPDATE_ROUNDTRIP_BUDGETS") == "1"
+
+API = r"/rest/api/(?:2|latest)/"
+AGILE = "/rest/agile/1.0/"
+
+USER = {
+    "self": "/rest/api/2/user?username=jdoe",
+    "name": "jdoe",
+    "key": "jdoe",
+    "displayName": "Jane Doe",
+    "emailAddress": "jdoe@example.com",
+}
+PROJECT = {"id": "10000", "key": "TEST", "name": "Test Project"}
+BOARD = {"id": 1, "name": "Test board", "type": "scrum"}
+SPRINT = {"id": 1, "name": "Sprint 1", "state": "active", "originBoardId": 1}
+COMMENT = {
+    "id": "10000",
+    "body": "Looks good",
+    "author": USER,
+    "created": "2025-01-01T00:00:00.000+0000",
+    "updated": "2025-01-01T00:00:00.000+0000",
+}
+ISSUE = {
+    "id": "10001",
+    "key": "TEST-1",
+    "fields": {
+        "summary": "Kernel panic on boot",
+        "description": "Stack trace attached",
+        "status": {"name": "Open", "statusCategory": {"key": "new", "name": "To Do"}},
+        "assignee": USER,
+        "reporter": USER,
+        "priority": {"name": "Major"},
+        "issuetype": {"name": "Bug"},
+        "fixVersions": [{"name": "1.0"}],
+        "created": "2025-01-01T00:00:00.000+0000",
+        "updated": "2025-01-02T00:00:00.000+0000",
+        server.QA_CONTACT_FID: USER,
+        server.STORY_POINTS_FID: 3,
+        "labels": ["kernel"],
+        "attachment": [{"id": "10000", "filename": "build.log", "size": 4096}],
+        "comment": {"comments": [COMMENT], "total": 1},
+    },
+}
+CHANGELOG = {
+    "total": 1,
+    "histories": [
+        {
+            "created": "2099-01-01T00:00:00.000+0000",
+            "author": USER,
+            "items": [{"field": "status", "fromString": "Open", "toString": "In Progress"}],
+        }
+    ],
+}
+FIELDS = [
+    {"id": "summary", "name": "Summary", "clauseNames": ["summary"]},
+    {"id": "customfield_12311140", "name": "Epic Link", "clauseNames": ["Epic Link"]},
+]
+LOG = b"".join(b"line %04d of the build log\n" % n for n in range(158))[:4096]
+
+
+def search(query):
+    """Search results: TEST-1 for any query, except for the children of an issue"""
+    jql = query["jql"][0]
+    issues = [] if "parent in" in jql else [ISSUE]
+    return {"startAt": 0, "maxResults": 50, "total": len(issues), "issues": issues}
+
+
+def issue(query):
+    if "changelog" in query.get("expand", [""])[0]:
+        return {**ISSUE, "changelog": CHANGELOG}
+    return ISSUE
+
+
+# (method, path pattern, status, body or function of the query string)
+ROUTES = [
+    ("GET", API + "serverInfo", 200, {"versionNumbers": [9, 12, 0], "deploymentType": "Server"}),
+    ("GET", API + "field", 200, FIELDS),
+    ("GET", API + "myself", 200, USER),
+    ("GET", API + "search", 200, search),
+    ("POST", API + "issue", 201, {"id": "10002", "key": "TEST-2"}),
+    ("GET", API + r"issue/TEST-1", 200, issue),
+    ("PUT", API + r"issue/TEST-1", 204, None),
+    ("DELETE", API + r"issue/TEST-1", 204, None),
+    ("PUT", API + r"issue/TEST-1/assignee", 204, None),
+    ("GET", API + r"issue/TEST-1/comment", 200, {"comments": [COMMENT], "total": 1}),
+    ("POST", API + r"issue/TEST-1/comment", 201, COMMENT),
+    ("DELETE", API + r"issue/TEST-1/comment/10000", 204, None),
+    (
+        "GET",
+        API + r"issue/TEST-1/transitions",
+        200,
+        {"transitions": [{"id": "11", "name": "In Progress"}, {"id": "21", "name": "Done"}]},
+    ),
+    ("POST", API + r"issue/TEST-1/transitions", 204, None),
+    (
+        "GET",
+        API + r"issue/createmeta/TEST/issuetypes",
+        200,
+        {"values": [{"id": "1", "name": "Bug"}]},
+    ),
+    ("GET", API + "project", 200, [PROJECT]),
+    ("GET", API + "project/TEST", 200, PROJECT),
+    ("GET", API + "project/TEST/components", 200, [{"id": "1", "name": "Backend"}]),
+    ("GET", API + "project/TEST/versions", 200, [{"id": "1", "name": "1.0"}]),
+    ("GET", API + "project/TEST/role", 200, {"Developers": "/rest/api/2/project/TEST/role/10001"}),
+    ("GET", API + "project/TEST/permissionscheme", 200, {"id": 1, "name": "Default scheme"}),
+    ("GET", API + "user", 200, USER),
+    ("GET", API + "user/search", 200, [USER]),
+    ("GET", API + "user/assignable/search", 200, [USER]),
+    ("GET", API + "user/assignable/multiProjectSearch", 200, [USER]),
+    ("GET", AGILE + "board", 200, {"isLast": True, "values": [BOARD]}),
+    ("GET", AGILE + "board/1", 200, BOARD),
+    ("GET", AGILE + "board/1/sprint", 200, {"isLast": True, "values": [SPRINT]}),
+    ("GET", AGILE + "sprint/1", 200, SPRINT),
+]
+
+
+class FakeJira(ThreadingHTTPServer):
+    """
+    Jira REST API serving canned responses and recording every request.
+
+    Bytes are those of the request path, request body and response body.
+    Headers are left out, and so is the server's own address, since it
+    depends on the port.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeJiraHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def respond(self, method, path):
+        """Status, content type and body of the response to a request."""
+        parts = urlsplit(path)
+        if method == "GET" and parts.path == "/secure/attachment/10000/build.log":
+            return 200, "text/plain", LOG
+        if method == "GET" and re.fullmatch(API + "attachment/10000", parts.path):
+            attachment = {
+                "id": "10000",
+                "filename": "build.log",
+                "size": len(LOG),
+                "mimeType": "text/plain",
+                "content": self.url + "/secure/attachment/10000/build.log",
+            }
+            return 200, "application/json", json.dumps(attachment).encode()
+        for route_method, pattern, status, body in ROUTES:
+            if route_method == method and re.fullmatch(pattern, parts.path):
+                if callable(body):
+                    body = body(parse_qs(parts.query))
+                data = b"" if body is None else json.dumps(body).encode()
+                return status, "application/json", data
+        return 404, "application/json", b'{"errorMessages": ["No fake for this request"]}'
+
+    def record(self, method, path, status, sent, received):
+        size = len(path) + len(sent) + len(received.replace(self.url.encode(), b""))
+        with self._lock:
+            self.requests.append({"method": method, "path": path, "status": status, "bytes": size})
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        sent = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, content_type, data = self.server.respond(self.command, self.path)
+        if status == 200 and (
+            match := re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        ):
+            start, end = int(match[1]), int(match[2])
+            status, data = 206, data[start : end + 1]
+        self.server.record(self.command, self.path, status, sent, data)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fulltext_search():
+    """fulltext_search needs the local issue store, which is empty here"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = server.IssueStore(os.path.join(directory, "issues.db"), [])
+        try:
+            with patch("server.issue_store", store):
+                return server.fulltext_search.fn("kernel")
+        finally:
+            store.close()
+
+
+# One typical call of every tool
+CALLS = {
+    "get_jira": lambda: server.get_jira.fn("TEST-1"),
+    "search_issues": lambda: server.search_issues.fn("project = TEST"),
+    "fulltext_search": fulltext_search,
+    "get_issue_changes": lambda: server.get_issue_changes.fn("TEST-1"),
+    "get_issues_changes": lambda: server.get_issues_changes.fn("project = TEST"),
+    "get_issue_tree": lambda: server.get_issue_tree.fn("TEST-1"),
+    "aggregate_issues": lambda: server.aggregate_issues.fn("project = TEST", ["status"]),
+    "batch": lambda: server.batch.fn(
+        [
+            {"tool": "get_current_user"},
+            {"tool": "list_projects"},
+            {"tool": "get_project_issue_types", "args": {"project_key": "TEST"}},
+        ]
+    ),
+    "create_issue": lambda: server.create_issue.fn("TEST", "New issue"),
+    "update_issue": lambda: server.update_issue.fn("TEST-1", summary="Renamed"),
+    "delete_issue": lambda: server.delete_issue.fn("TEST-1"),
+    "list_attachments": lambda: server.list_attachments.fn("TEST-1"),
+    "get_attachment": lambda: server.get_attachment.fn("10000", max_bytes=1024),
+    "get_issue_comments": lambda: server.get_issue_comments.fn("TEST-1"),
+    "add_comment": lambda: server.add_comment.fn("TEST-1", "Looks good"),
+    "delete_comment": lambda: server.delete_comment.fn("TEST-1", "10000"),
+    "assign_issue": lambda: server.assign_issue.fn("TEST-1", "jdoe"),
+    "unassign_issue": lambda: server.unassign_issue.fn("TEST-1"),
+    "transition_issue": lambda: server.transition_issue.fn("TEST-1", "Done"),
+    "get_issue_transitions": lambda: server.get_issue_transitions.fn("TEST-1"),
+    "add_issue_labels": lambda: server.add_issue_labels.fn("TEST-1", ["triaged"]),
+    "remove_issue_labels": lambda: server.remove_issue_labels.fn("TEST-1", ["triaged"]),
+    "list_projects": lambda: server.list_projects.fn(),
+    "get_project": lambda: server.get_project.fn("TEST"),
+    "get_project_components": lambda: server.get_project_components.fn("TEST"),
+    "get_project_versions": lambda: server.get_project_versions.fn("TEST"),
+    "get_project_roles": lambda: server.get_project_roles.fn("TEST"),
+    "get_project_permission_scheme": lambda: server.get_project_permission_scheme.fn("TEST"),
+    "get_project_issue_types": lambda: server.get_project_issue_types.fn("TEST"),
+    "list_boards": lambda: server.list_boards.fn(),
+    "list_sprints": lambda: server.list_sprints.fn(1),
+    "get_sprint": lambda: server.get_sprint.fn(1),
+    "get_sprints_by_name": lambda: server.get_sprints_by_name.fn(1),
+    "sprint_report": lambda: server.sprint_report.fn(1, 1),
+    "search_users": lambda: server.search_users.fn("jdoe"),
+    "get_user": lambda: server.get_user.fn("jdoe"),
+    "get_current_user": lambda: server.get_current_user.fn(),
+    "get_assignable_users_for_project": lambda: server.get_assignable_users_for_project.fn("TEST"),
+    "get_assignable_users_for_issue": lambda: server.get_assignable_users_for_issue.fn("TEST-1"),
+}
+MODES = ["stdio", "http"]
+
+# Measurements of this run, written to BUDGETS_PATH when updating
+measured = {}
+
+
+@pytest.fixture(scope="module")
+def fake_jira():
+    fake = FakeJira()
+    thread = threading.Thread(target=fake.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.shutdown()
+    fake.server_close()
+    if UPDATE_BUDGETS:
+        BUDGETS_PATH.write_text(json.dumps(measured, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture
+def budgets():
+    return json.loads(BUDGETS_PATH.read_text())
+
+
+def measure(fake, mode, call):
+    """Run a tool call in stdio or HTTP mode and return what it cost."""
+    real_jira = jira.JIRA
+    constructed = []
+
+    def construct(*args, **kwargs):
+        constructed.append(kwargs)
+        return real_jira(*args, **kwargs)
+
+    stdio_client = real_jira(server=fake.url, token_auth="stdio-token")
+    headers = {} if mode == "stdio" else {"authorization": "Bearer http-token"}
+    registry = server.FieldRegistry(server.JIRA_CUSTOM_FIELDS)
+    # Field names are looked up once per process, so measure calls after that
+    registry.field_id("Epic Link", stdio_client)
+
+    with (
+        patch("server.JIRA", side_effect=construct),
+        patch("server.JIRA_URL", fake.url),
+        patch("server.jira_client", stdio_client if mode == "stdio" else None),
+        patch("server.get_http_headers", return_value=headers),
+        patch("server.field_registry", registry),
+    ):
+        fake.requests.clear()
+        call()
+        requests = list(fake.requests)
+
+    return {
+        "requests": len(requests),
+        "clients": len(constructed),
+        "bytes": sum(r["bytes"] for r in requests),
+    }, requests
+
+
+def test_every_tool_has_a_call():
+    tools = asyncio.run(server.mcp.get_tools())
+    assert set(CALLS) == set(tools)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("tool", sorted(CALLS))
+def test_roundtrip_budget(fake_jira, budgets, tool, mode):
+    cost, requests = measure(fake_jira, mode, CALLS[tool])
+
+    unserved = [f"{r['method']} {r['path']}" for r in requests if r["status"] == 404]
+    assert not unserved, f"The fake Jira has no response for {unserved}"
+    measured.setdefault(tool, {})[mode] = cost
+    if UPDATE_BUDGETS:
+        return
+    trace = "\n".join(f"  {r['method']} {r['path']} ({r['bytes']} bytes)" for r in requests)
+    assert cost == budgets.get(tool, {}).get(mode), f"{tool} in {mode} mode made:\n{trace}"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 
+import json
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+import threading
+import time
+from pathlib import Path
+from unittest.mock import ANY, DEFAULT, patch, MagicMock
 from fastapi import HTTPException
 
 # Set up required environment variables before importing server module
@@ -31,9 +35,11 @@ class MockJiraIssue:
         self.fields.assignee = MagicMock() if kwargs.get("assignee") else None
         if self.fields.assignee:
             self.fields.assignee.displayName = kwargs.get("assignee", "Test User")
+            self.fields.assignee.name = kwargs.get("assignee_name", "tuser")
 
         self.fields.reporter = MagicMock()
         self.fields.reporter.displayName = kwargs.get("reporter", "Test Reporter")
+        self.fields.reporter.name = kwargs.get("reporter_name", "treporter")
 
         self.fields.priority = MagicMock()
         self.fields.priority.name = kwargs.get("priority", "Medium")
@@ -45,6 +51,8 @@ class MockJiraIssue:
         self.fields.created = kwargs.get("created", "2023-01-01T00:00:00.000+0000")
         self.fields.updated = kwargs.get("updated", "2023-01-01T00:00:00.000+0000")
         self.fields.labels = kwargs.get("labels", [])
+        self.fields.parent = kwargs.get("parent")
+        self.fields.issuelinks = kwargs.get("issuelinks", [])
 
         # QA Contact custom field
         setattr(self.fields, server.QA_CONTACT_FID, kwargs.get("qa_contact"))
@@ -57,6 +65,50 @@ class MockJiraIssue:
         self.update = MagicMock()
         self.delete = MagicMock()
 
+    @property
+    def raw(self):
+        """The issue as Jira returns it in JSON"""
+        fields = self.fields
+
+        def user(value):
+            return value and {"name": value.name, "displayName": value.displayName}
+
+        qa_contact = getattr(fields, server.QA_CONTACT_FID)
+        return {
+            "key": self.key,
+            "fields": {
+                "summary": fields.summary,
+                "description": fields.description,
+                "status": {"name": fields.status.name},
+                "assignee": user(fields.assignee),
+                "reporter": user(fields.reporter),
+                "priority": {"name": fields.priority.name},
+                "issuetype": {"name": fields.issuetype.name},
+                "fixVersions": [{"name": v.name} for v in fields.fixVersions],
+                "created": fields.created,
+                "updated": fields.updated,
+                "labels": fields.labels,
+                "parent": fields.parent and {"key": fields.parent.key},
+                server.QA_CONTACT_FID: qa_contact and {"displayName": qa_contact.displayName},
+                "comment": {"comments": [c.raw for c in fields.comment.comments]},
+            },
+        }
+
+
+def search_result(issues):
+    """A single page of raw search results, as returned by the search endpoint"""
+    return {"startAt": 0, "total": len(issues), "issues": [issue.raw for issue in issues]}
+
+
+def search_calls(client):
+    """The parameters of every search request made with a mock client"""
+    return [c[1]["params"] for c in client._get_json.call_args_list if c[0][0] == "search"]
+
+
+def issue_calls(client):
+    """The paths of every issue request made with a mock client"""
+    return [c[0][0] for c in client._get_json.call_args_list if c[0][0].startswith("issue/")]
+
 
 class MockJiraProject:
     """Mock Jira project object"""
@@ -90,6 +142,17 @@ class MockJiraComment:
         # Mock methods
         self.delete = MagicMock()
 
+    @property
+    def raw(self):
+        """The comment as Jira returns it in JSON"""
+        return {
+            "id": self.id,
+            "body": self.body,
+            "author": {"displayName": self.author.displayName},
+            "created": self.created,
+            "updated": self.updated,
+        }
+
 
 @pytest.fixture
 def mock_jira_client():
@@ -100,6 +163,12 @@ def mock_jira_client():
         yield mock_client
 
 
+def put_payload(client):
+    """The JSON body of the only PUT request made with a mock client"""
+    client._session.put.assert_called_once()
+    return json.loads(client._session.put.call_args[1]["data"])
+
+
 @pytest.fixture
 def sample_issue():
     """Create a sample issue for testing"""
@@ -122,23 +191,27 @@ class TestGetJira:
     """Test the get_jira tool"""
 
     def test_get_jira_success(self, mock_jira_client, sample_issue):
-        mock_jira_client.issue.return_value = sample_issue
+        mock_jira_client._get_json.return_value = sample_issue.raw
 
         result = server.get_jira.fn("TEST-123")
 
         assert result == "# TEST-123: Test Issue\n\nThis is a test issue"
-        mock_jira_client.issue.assert_called_once_with("TEST-123")
+        mock_jira_client._get_json.assert_called_once_with(
+            "issue/TEST-123",
+            params={"fields": ",".join(server.issue_fields(server.field_registry.resolve()))},
+            base=mock_jira_client.JIRA_BASE_URL,
+        )
 
     def test_get_jira_missing_fields(self, mock_jira_client):
         issue = MockJiraIssue("TEST-123", summary=None, description=None)
-        mock_jira_client.issue.return_value = issue
+        mock_jira_client._get_json.return_value = issue.raw
 
         result = server.get_jira.fn("TEST-123")
 
         assert result == "# TEST-123: \n\n"
 
     def test_get_jira_not_found(self, mock_jira_client):
-        mock_jira_client.issue.side_effect = Exception("Issue not found")
+        mock_jira_client._get_json.side_effect = Exception("Issue not found")
 
         with pytest.raises(HTTPException) as exc_info:
             server.get_jira.fn("NONEXISTENT-123")
@@ -155,7 +228,7 @@ class TestSearchIssues:
             MockJiraIssue("TEST-1", "First Issue"),
             MockJiraIssue("TEST-2", "Second Issue", assignee="Jane Doe"),
         ]
-        mock_jira_client.search_issues.return_value = issues
+        mock_jira_client._get_json.return_value = search_result(issues)
 
         result = server.search_issues.fn("project = TEST", max_results=50)
 
@@ -163,17 +236,26 @@ class TestSearchIssues:
         assert "TEST-2" in result
         assert "First Issue" in result
         assert "Second Issue" in result
-        mock_jira_client.search_issues.assert_called_once_with("project = TEST", maxResults=50)
+        mock_jira_client._get_json.assert_called_once_with(
+            "search",
+            params={
+                "jql": "project = TEST",
+                "startAt": 0,
+                "maxResults": 50,
+                "fields": ",".join(server.issue_fields(server.field_registry.resolve())),
+            },
+            base=mock_jira_client.JIRA_BASE_URL,
+        )
 
     def test_search_issues_empty_result(self, mock_jira_client):
-        mock_jira_client.search_issues.return_value = []
+        mock_jira_client._get_json.return_value = search_result([])
 
         result = server.search_issues.fn("project = EMPTY")
 
         assert result == ""
 
     def test_search_issues_invalid_jql(self, mock_jira_client):
-        mock_jira_client.search_issues.side_effect = Exception("Invalid JQL")
+        mock_jira_client._get_json.side_effect = Exception("Invalid JQL")
 
         with pytest.raises(HTTPException) as exc_info:
             server.search_issues.fn("invalid jql")
@@ -181,6 +263,174 @@ class TestSearchIssues:
         assert exc_info.value.status_code == 400
         assert "JQL search failed" in str(exc_info.value.detail)
 
+    def test_search_issues_pages_large_results(self, mock_jira_client):
+        issues = [MockJiraIssue(f"TEST-{n}") for n in range(1, 701)]
+        mock_jira_client._get_json.side_effect = [
+            {"total": 700, "issues": [i.raw for i in issues[:500]]},
+            {"total": 700, "issues": [i.raw for i in issues[500:]]},
+        ]
+
+        result = server.search_issues.fn("project = TEST", max_results=600)
+
+        assert "TEST-600" in result
+        assert "TEST-601" not in result
+        assert search_calls(mock_jira_client)[1]["startAt"] == 500
+
+
+class TestIssueRecord:
+    """Test the compact issue representation"""
+
+    def test_as_dict(self):
+        issue = MockJiraIssue(
+            "TEST-1",
+            assignee="Jane Doe",
+            fixVersions=[MagicMock(name="v")],
+            qa_contact=MagicMock(displayName="QA Person"),
+        )
+        issue.fields.fixVersions[0].name = "2.0"
+
+        record = server.IssueRecord.from_raw(issue.raw)
+
+        assert record.as_dict() == {
+            "key": "TEST-1",
+            "summary": "Test Summary",
+            "status": "Open",
+            "assignee": "Jane Doe",
+            "qa_contact": "QA Person",
+            "story_points": None,
+            "reporter": "Test Reporter",
+            "priority": "Medium",
+            "issuetype": "Task",
+            "fixVersion": "2.0",
+            "created": "2023-01-01T00:00:00.000+0000",
+            "updated": "2023-01-01T00:00:00.000+0000",
+            "description": "Test Description",
+        }
+        assert (record.assignee_id, record.reporter_id) == ("tuser", "treporter")
+
+    def test_repeated_values_are_shared(self):
+        raws = json.loads(json.dumps([MockJiraIssue(f"TEST-{n}").raw for n in range(2)]))
+
+        first, second = (server.IssueRecord.from_raw(raw) for raw in raws)
+
+        assert raws[0]["fields"]["status"]["name"] is not raws[1]["fields"]["status"]["name"]
+        assert first.status is second.status
+        assert first.reporter is second.reporter
+
+    @pytest.mark.slow
+    def test_memory_over_10k_issues(self):
+        import tracemalloc
+        from jira.resources import Issue
+
+        template = MockJiraIssue("TEST-1", assignee="Jane Doe").raw
+        payload = json.dumps(
+            [
+                {"key": f"TEST-{n}", "fields": {**template["fields"], "summary": f"Summary {n}"}}
+                for n in range(10_000)
+            ]
+        )
+
+        def allocated(build):
+            raws = json.loads(payload)
+            tracemalloc.start()
+            try:
+                objects = build(raws)
+                del raws
+                return tracemalloc.get_traced_memory()[0], objects
+            finally:
+                tracemalloc.stop()
+
+        records, _ = allocated(lambda raws: [server.IssueRecord.from_raw(r) for r in raws])
+        resources, _ = allocated(
+            lambda raws: [Issue(options={}, session=None, raw=r) for r in raws]
+        )
+        dicts, _ = allocated(lambda raws: [server.IssueRecord.from_raw(r).as_dict() for r in raws])
+
+        assert records * 3 < resources
+        assert records < dicts
+
+
+class TestFieldRegistry:
+    """Test the configurable custom fields"""
+
+    FIELDS = [
+        {"id": "customfield_10016", "name": "Story Points"},
+        {"id": "customfield_10020", "name": "Sprint"},
+        {"id": "labels", "name": "Labels"},
+    ]
+
+    def test_parse(self):
+        entries = server.FieldRegistry.parse("points=Story Points, Sprint\n# comment\nlabels")
+
+        assert entries == {"points": "Story Points", "sprint": "Sprint", "labels": "labels"}
+
+    def test_names_resolved_with_one_fetch(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = self.FIELDS
+        registry = server.FieldRegistry("points=Story Points,Sprint,qa=customfield_1")
+
+        for _ in range(3):
+            resolved = registry.resolve(mock_jira_client)
+
+        assert resolved == [
+            ("points", "customfield_10016"),
+            ("sprint", "customfield_10020"),
+            ("qa", "customfield_1"),
+        ]
+        mock_jira_client._get_json.assert_called_once_with("field", params=None, base=ANY)
+
+    def test_unknown_name_is_skipped_and_not_refetched(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = self.FIELDS
+        registry = server.FieldRegistry("Team")
+
+        assert registry.resolve(mock_jira_client) == []
+        assert registry.resolve(mock_jira_client) == []
+        assert mock_jira_client._get_json.call_count == 1
+
+    def test_search_projects_and_shows_custom_fields(self, mock_jira_client):
+        raw = MockJiraIssue("TEST-1").raw
+        raw["fields"]["customfield_10016"] = 5
+        raw["fields"]["customfield_10020"] = [
+            "com.atlassian.greenhopper.service.sprint.Sprint@1f[id=1,state=ACTIVE,name=Sprint 7,goal=]"
+        ]
+        mock_jira_client._get_json.side_effect = lambda path, **kwargs: (
+            self.FIELDS if path == "field" else {"total": 1, "issues": [raw]}
+        )
+        registry = server.FieldRegistry("points=Story Points,Sprint")
+
+        with patch.object(server, "field_registry", registry):
+            result = server.search_issues.fn("project = TEST", max_results=1)
+
+        fields = search_calls(mock_jira_client)[0]["fields"].split(",")
+        assert fields == server.ISSUE_FIELDS + ["customfield_10016", "customfield_10020"]
+        assert '"points": 5' in result
+        assert '"Sprint 7"' in result
+        assert "qa_contact" not in result
+
+    def test_file_is_reloaded_when_changed(self, tmp_path):
+        path = tmp_path / "fields.txt"
+        path.write_text("team=customfield_2\n")
+        registry = server.FieldRegistry("qa=customfield_1", str(path))
+        changes = []
+        registry.listeners.append(lambda: changes.append(True))
+
+        assert registry.resolve() == [("qa", "customfield_1"), ("team", "customfield_2")]
+
+        path.write_text("points=customfield_3\n")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+
+        assert registry.resolve() == [("qa", "customfield_1"), ("points", "customfield_3")]
+        assert registry.resolve() == [("qa", "customfield_1"), ("points", "customfield_3")]
+        assert len(changes) == 2
+
+    def test_custom_value(self):
+        assert server.custom_value({"value": "Red"}) == "Red"
+        assert server.custom_value([{"name": "Team A"}, {"name": "Team B"}]) == [
+            "Team A",
+            "Team B",
+        ]
+        assert server.custom_value(3.5) == 3.5
+        assert server.custom_value(None) is None
+
 
 class TestProjectOperations:
     """Test project-related tools"""
@@ -190,24 +440,28 @@ class TestProjectOperations:
             MockJiraProject("TEST1", "Test Project 1"),
             MockJiraProject("TEST2", "Test Project 2"),
         ]
-        mock_jira_client.projects.return_value = projects
+        mock_jira_client._get_json.return_value = [p.raw for p in projects]
 
         result = server.list_projects.fn()
 
         assert "TEST1" in result
         assert "TEST2" in result
-        mock_jira_client.projects.assert_called_once()
+        mock_jira_client._get_json.assert_called_once_with(
+            "project", params=None, base=mock_jira_client.JIRA_BASE_URL
+        )
+        mock_jira_client.projects.assert_not_called()
 
     def test_get_project_success(self, mock_jira_client, sample_project):
-        mock_jira_client.project.return_value = sample_project
+        mock_jira_client._get_json.return_value = sample_project.raw
 
         result = server.get_project.fn("TEST")
 
         assert "TEST" in result
-        mock_jira_client.project.assert_called_once_with("TEST")
+        assert mock_jira_client._get_json.call_args[0] == ("project/TEST",)
 
     def test_get_project_not_found(self, mock_jira_client):
-        mock_jira_client.project.side_effect = Exception("Project not found")
+        mock_jira_client._get_json.side_effect = Exception("Project not found")
+        mock_jira_client.myself.return_value = {"name": "jdoe"}
 
         with pytest.raises(HTTPException) as exc_info:
             server.get_project.fn("NONEXISTENT")
@@ -230,22 +484,51 @@ class TestUserOperations:
 
     def test_search_users_success(self, mock_jira_client):
         users = [MockJiraUser("123", "John Doe"), MockJiraUser("456", "Jane Smith")]
-        mock_jira_client.search_users.return_value = users
+        mock_jira_client._get_json.return_value = [u.raw for u in users]
+        mock_jira_client._is_cloud = True
 
         result = server.search_users.fn("john", max_results=5)
 
         assert "John Doe" in result
         assert "Jane Smith" in result
-        mock_jira_client.search_users.assert_called_once_with("john", maxResults=5)
+        mock_jira_client._get_json.assert_called_once_with(
+            "user/search",
+            params={"query": "john", "maxResults": 5},
+            base=mock_jira_client.JIRA_BASE_URL,
+        )
+
+    def test_search_users_server(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = []
+        mock_jira_client._is_cloud = False
+
+        server.search_users.fn("john")
+
+        assert mock_jira_client._get_json.call_args[1]["params"]["username"] == "john"
 
     def test_get_user_success(self, mock_jira_client):
         user = MockJiraUser("12345", "Test User")
-        mock_jira_client.user.return_value = user
+        mock_jira_client._get_json.return_value = user.raw
+        mock_jira_client._is_cloud = True
 
         result = server.get_user.fn("12345")
 
         assert "12345" in result
-        mock_jira_client.user.assert_called_once_with("12345")
+        mock_jira_client._get_json.assert_called_once_with(
+            "user", params={"accountId": "12345"}, base=mock_jira_client.JIRA_BASE_URL
+        )
+
+    def test_assignable_users_for_issue(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = [MockJiraUser("123", "John Doe").raw]
+        mock_jira_client._is_cloud = False
+
+        result = server.get_assignable_users_for_issue.fn("TEST-1")
+
+        assert "John Doe" in result
+        assert mock_jira_client._get_json.call_args[1]["params"] == {
+            "username": "",
+            "issueKey": "TEST-1",
+            "maxResults": 10,
+        }
 
 
 class TestWriteOperations:
@@ -274,15 +557,17 @@ class TestWriteOperations:
         assert call_args["assignee"]["name"] == "john.doe"
 
     @patch("server.ENABLE_WRITE", True)
-    def test_update_issue_success(self, mock_jira_client, sample_issue):
-        mock_jira_client.issue.return_value = sample_issue
-
+    def test_update_issue_success(self, mock_jira_client):
         result = server.update_issue.fn(
             issue_key="TEST-123", summary="Updated Summary", priority="Low"
         )
 
         assert "Updated issue TEST-123 successfully" in result
-        sample_issue.update.assert_called_once()
+        mock_jira_client._get_url.assert_called_once_with("issue/TEST-123")
+        assert put_payload(mock_jira_client) == {
+            "fields": {"summary": "Updated Summary", "priority": {"name": "Low"}}
+        }
+        mock_jira_client.issue.assert_not_called()
 
     @patch("server.ENABLE_WRITE", True)
     def test_add_comment_success(self, mock_jira_client, sample_issue):
@@ -293,16 +578,19 @@ class TestWriteOperations:
         result = server.add_comment.fn("TEST-123", "Test comment")
 
         assert "Added comment to TEST-123: comment-123" in result
-        mock_jira_client.add_comment.assert_called_once_with(sample_issue, "Test comment")
+        mock_jira_client.add_comment.assert_called_once_with("TEST-123", "Test comment")
+        mock_jira_client.issue.assert_not_called()
 
     @patch("server.ENABLE_WRITE", True)
-    def test_assign_issue_success(self, mock_jira_client, sample_issue):
-        mock_jira_client.issue.return_value = sample_issue
+    def test_assign_issue_success(self, mock_jira_client):
+        mock_jira_client._get_user_id.return_value = "john.doe"
+        mock_jira_client._is_cloud = False
 
         result = server.assign_issue.fn("TEST-123", "john.doe")
 
         assert "Assigned issue TEST-123 to john.doe" in result
-        mock_jira_client.assign_issue.assert_called_once_with(sample_issue, "john.doe")
+        mock_jira_client._get_latest_url.assert_called_once_with("issue/TEST-123/assignee")
+        assert put_payload(mock_jira_client) == {"name": "john.doe"}
 
     @patch("server.ENABLE_WRITE", True)
     def test_transition_issue_success(self, mock_jira_client, sample_issue):
@@ -313,7 +601,8 @@ class TestWriteOperations:
         result = server.transition_issue.fn("TEST-123", "In Progress")
 
         assert "Transitioned issue TEST-123 to 'In Progress'" in result
-        mock_jira_client.transition_issue.assert_called_once_with(sample_issue, "1")
+        mock_jira_client.transition_issue.assert_called_once_with("TEST-123", "1")
+        mock_jira_client.issue.assert_not_called()
 
     @patch("server.ENABLE_WRITE", True)
     def test_transition_issue_not_found(self, mock_jira_client, sample_issue):
@@ -327,6 +616,430 @@ class TestWriteOperations:
         assert "Available transitions: In Progress" in result
 
 
+class TestIdempotency:
+    """Test idempotency keys on write tools"""
+
+    @pytest.fixture(autouse=True)
+    def idempotency_cache(self):
+        with patch("server.idempotency_cache", server.TTLCache(ttl=60, maxsize=100)) as cache:
+            yield cache
+
+    def test_retry_returns_first_result(self, mock_jira_client):
+        mock_jira_client.create_issue.return_value = MockJiraIssue("TEST-456", "New Issue")
+
+        first = server.create_issue.fn("TEST", "New Issue", idempotency_key="abc")
+        retry = server.create_issue.fn("TEST", "New Issue", idempotency_key="abc")
+        other = server.create_issue.fn("TEST", "New Issue", idempotency_key="def")
+
+        assert first == retry == other == "Created issue TEST-456: New Issue"
+        assert mock_jira_client.create_issue.call_count == 2
+
+    def test_key_reused_with_other_arguments(self, mock_jira_client, sample_issue):
+        mock_jira_client.issue.return_value = sample_issue
+        mock_jira_client.add_comment.return_value = MockJiraComment("1")
+        server.add_comment.fn("TEST-123", "First", idempotency_key="abc")
+
+        with pytest.raises(HTTPException) as exc_info:
+            server.add_comment.fn("TEST-123", "Second", idempotency_key="abc")
+
+        assert exc_info.value.status_code == 409
+        mock_jira_client.add_comment.assert_called_once()
+
+    def test_keys_are_per_caller_and_tool(self, mock_jira_client):
+        with patch("server.jira_client", None):
+            for token in ("alice", "bob"):
+                with patch(
+                    "server.get_http_headers", return_value={"authorization": f"Bearer {token}"}
+                ):
+                    server.add_issue_labels.fn("TEST-123", ["a"], idempotency_key="abc")
+        server.remove_issue_labels.fn("TEST-123", ["a"], idempotency_key="abc")
+
+        assert mock_jira_client._session.put.call_count == 3
+
+    def test_failures_are_retried(self, mock_jira_client):
+        mock_jira_client._session.delete.side_effect = [Exception("timeout"), None]
+
+        with pytest.raises(HTTPException):
+            server.delete_issue.fn("TEST-123", idempotency_key="abc")
+        result = server.delete_issue.fn("TEST-123", idempotency_key="abc")
+
+        assert result == "Deleted issue TEST-123"
+        assert mock_jira_client._session.delete.call_count == 2
+
+    def test_concurrent_retry_waits_for_first_call(self, mock_jira_client):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_put(url, data):
+            started.set()
+            release.wait(5)
+
+        mock_jira_client._session.put.side_effect = slow_put
+        results = []
+        first = threading.Thread(
+            target=lambda: results.append(
+                server.update_issue.fn("TEST-123", summary="New", idempotency_key="abc")
+            )
+        )
+        first.start()
+        started.wait(5)
+        retry = threading.Thread(
+            target=lambda: results.append(
+                server.update_issue.fn("TEST-123", summary="New", idempotency_key="abc")
+            )
+        )
+        retry.start()
+        release.set()
+        first.join(5)
+        retry.join(5)
+
+        assert results == ["Updated issue TEST-123 successfully"] * 2
+        mock_jira_client._session.put.assert_called_once()
+        assert server._idempotency_locks == {}
+
+
+class TestWriteQueue:
+    """Test merging of rapid edits to the same issue"""
+
+    @pytest.fixture(autouse=True)
+    def write_queue(self):
+        with patch("server.write_queue", server.IssueWriteQueue(window=0.2)) as queue:
+            yield queue
+
+    def _concurrently(self, *calls):
+        results = [None] * len(calls)
+
+        def run(i, call):
+            try:
+                results[i] = call()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=item) for item in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_edits_within_window_are_merged(self, mock_jira_client):
+        mock_jira_client._get_user_id.return_value = "jdoe"
+        mock_jira_client._is_cloud = False
+
+        results = self._concurrently(
+            lambda: server.update_issue.fn("TEST-1", summary="New", priority="High"),
+            lambda: server.add_issue_labels.fn("TEST-1", ["a", "b"]),
+            lambda: server.remove_issue_labels.fn("TEST-1", ["c"]),
+            lambda: server.assign_issue.fn("TEST-1", "jdoe"),
+            lambda: server.update_issue.fn("TEST-1", summary="Newer"),
+        )
+
+        assert results == [
+            "Updated issue TEST-1 successfully",
+            "Added labels ['a', 'b'] to issue TEST-1",
+            "Removed labels ['c'] from issue TEST-1",
+            "Assigned issue TEST-1 to jdoe",
+            "Updated issue TEST-1 successfully",
+        ]
+        assert put_payload(mock_jira_client) == {
+            "fields": {
+                "summary": "Newer",
+                "priority": {"name": "High"},
+                "assignee": {"name": "jdoe"},
+            },
+            "update": {"labels": [{"add": "a"}, {"add": "b"}, {"remove": "c"}]},
+        }
+
+    def test_transitions_keep_their_order(self, mock_jira_client, sample_issue):
+        calls = []
+        mock_jira_client._session.put.side_effect = lambda url, data: calls.append(json.loads(data))
+        mock_jira_client.issue.return_value = sample_issue
+        mock_jira_client.transitions.return_value = [{"id": "1", "name": "Done"}]
+        mock_jira_client.transition_issue.side_effect = lambda *a: calls.append("transition")
+
+        self._concurrently(
+            lambda: server.update_issue.fn("TEST-1", summary="Before"),
+            lambda: server.transition_issue.fn("TEST-1", "Done"),
+            lambda: server.update_issue.fn("TEST-1", summary="After"),
+        )
+
+        assert calls == [
+            {"fields": {"summary": "Before"}},
+            "transition",
+            {"fields": {"summary": "After"}},
+        ]
+
+    def test_other_issues_and_callers_not_merged(self, mock_jira_client):
+        def update(key, token):
+            with patch("server.get_http_headers", return_value={"authorization": token}):
+                return server.update_issue.fn(key, summary="New")
+
+        with patch("server.jira_client", None):
+            self._concurrently(
+                lambda: update("TEST-1", "Bearer alice"),
+                lambda: update("TEST-2", "Bearer alice"),
+                lambda: update("TEST-1", "Bearer bob"),
+            )
+
+        assert mock_jira_client._session.put.call_count == 3
+
+    def test_failure_reaches_every_caller(self, mock_jira_client):
+        mock_jira_client._session.put.side_effect = Exception("Field 'priority' cannot be set")
+
+        results = self._concurrently(
+            lambda: server.update_issue.fn("TEST-1", priority="Urgent"),
+            lambda: server.add_issue_labels.fn("TEST-1", ["a"]),
+        )
+
+        assert [r.status_code for r in results] == [400, 400]
+        assert "cannot be set" in results[1].detail
+        mock_jira_client._session.put.assert_called_once()
+
+    def test_conflicting_edits_are_not_merged(self):
+        batch = server.WriteBatch()
+        batch.add({"labels": ["a"]}, {}, None)
+
+        assert batch.accepts({"summary": "x"}, {})
+        assert not batch.accepts({}, {"labels": [{"add": "b"}]})
+
+    def test_tool_calls_run_concurrently(self, mock_jira_client, sample_issue):
+        import asyncio
+        from fastmcp import Client
+
+        def slow_get_json(path, **kwargs):
+            time.sleep(0.3)
+            return sample_issue.raw
+
+        mock_jira_client._get_json.side_effect = slow_get_json
+
+        async def call_four():
+            async with Client(server.mcp) as client:
+                return await asyncio.gather(
+                    *(client.call_tool("get_jira", {"issue_key": "TEST-123"}) for _ in range(4))
+                )
+
+        started = time.monotonic()
+        results = asyncio.run(call_four())
+
+        assert time.monotonic() - started < 1.0
+        assert all("Test Issue" in r.content[0].text for r in results)
+
+
+class TestFairScheduler:
+    """Test the per-caller limits on concurrent tool calls"""
+
+    def _run(self, scheduler, calls, hold=0.05):
+        """
+        Run (caller, name) calls, returning the order in which they started.
+        A (caller, name, n) call is a batch of n calls.
+        """
+        import asyncio
+        import contextvars
+        from types import SimpleNamespace
+
+        started = []
+        current_caller = contextvars.ContextVar("caller")
+
+        async def call(caller, name, batch_size=None):
+            if batch_size is None:
+                message = SimpleNamespace(name="get_current_user", arguments={})
+            else:
+                message = SimpleNamespace(name="batch", arguments={"calls": [{}] * batch_size})
+
+            async def call_next(context):
+                started.append(name)
+                await asyncio.sleep(hold)
+                return name
+
+            current_caller.set(caller)
+            return await scheduler.on_call_tool(SimpleNamespace(message=message), call_next)
+
+        async def main():
+            tasks = []
+            for args in calls:
+                tasks.append(asyncio.create_task(call(*args)))
+                await asyncio.sleep(0)
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        with patch("server.get_caller_id", side_effect=lambda headers: current_caller.get()):
+            return started, asyncio.run(main())
+
+    def test_callers_take_turns(self):
+        scheduler = server.FairScheduler(max_active=1, max_per_caller=4, timeout=5)
+
+        started, _ = self._run(
+            scheduler, [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")]
+        )
+
+        assert started == ["a1", "a2", "b1", "c1", "a3"]
+        assert scheduler.metrics()["completed_calls"] == 5
+        assert scheduler.metrics()["active_calls"] == 0
+
+    def test_per_caller_limit(self):
+        scheduler = server.FairScheduler(max_active=10, max_per_caller=2, timeout=5)
+
+        started, _ = self._run(scheduler, [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")])
+
+        assert started[:3] == ["a1", "a2", "b1"]
+
+    def test_batch_takes_a_slot_per_concurrent_call(self):
+        scheduler = server.FairScheduler(max_active=10, max_per_caller=4, timeout=5)
+
+        started, _ = self._run(
+            scheduler, [("a", "a-batch", 3), ("a", "a1"), ("a", "a2"), ("b", "b-batch", 20)]
+        )
+
+        assert started[:3] == ["a-batch", "a1", "b-batch"]
+        assert started[3] == "a2"
+        assert scheduler.metrics()["active_calls"] == 0
+
+    def test_queue_timeout(self):
+        scheduler = server.FairScheduler(max_active=1, max_per_caller=1, timeout=0.05)
+
+        started, results = self._run(scheduler, [("a", "a1"), ("b", "b1")], hold=0.2)
+
+        assert started == ["a1"]
+        assert results[0] == "a1"
+        assert results[1].status_code == 503
+        assert scheduler.metrics()["queue_timeouts"] == 1
+        assert scheduler.waiting == {}
+
+    def test_timeout_after_admission_releases_slot(self):
+        import asyncio
+
+        scheduler = server.FairScheduler(max_active=1, max_per_caller=1, timeout=5)
+
+        async def late_timeout(future, timeout):
+            # The timeout fires in the same loop iteration the call is admitted
+            await future
+            raise asyncio.TimeoutError
+
+        with patch("server.asyncio.wait_for", late_timeout):
+            started, results = self._run(scheduler, [("a", "a1"), ("b", "b1")])
+
+        assert started == ["a1"]
+        assert results[1].status_code == 503
+        assert scheduler.metrics()["active_calls"] == 0
+        assert scheduler.active == {}
+
+    def test_metrics_route(self):
+        from starlette.testclient import TestClient
+
+        with TestClient(server.mcp.http_app()) as client:
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert set(response.json()) >= {"active_calls", "queued_calls", "queue_timeouts"}
+
+
+class TestBatch:
+    """Test running several read tools in one call"""
+
+    def test_results_in_order(self, mock_jira_client):
+        mock_jira_client.myself.return_value = {"name": "jdoe"}
+        mock_jira_client._get_json.side_effect = lambda path, **kwargs: {
+            "project": [{"key": "TEST"}],
+            "project/TEST": {"key": "TEST", "name": "Test Project"},
+        }[path]
+
+        result = server.batch.fn(
+            [
+                {"tool": "get_current_user"},
+                {"tool": "list_projects"},
+                {"tool": "get_project", "args": {"project_key": "TEST"}},
+            ]
+        )
+
+        first, second, third = (result.index(f"## {n}. ") for n in (1, 2, 3))
+        assert first < second < third
+        assert "jdoe" in result[first:second]
+        assert '"name": "Test Project"' in result[third:]
+
+    def test_errors_reported_per_call(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = Exception("Project not found")
+        mock_jira_client.myself.return_value = {"name": "jdoe"}
+
+        result = server.batch.fn(
+            [
+                {"tool": "get_project", "args": {"project_key": "NOPE"}},
+                {"tool": "create_issue", "args": {"project_key": "TEST"}},
+                {"tool": "list_sprints", "args": {"board_id": "not a number"}},
+                {"tool": "get_current_user"},
+            ]
+        )
+
+        assert "## 1. get_project failed" in result
+        assert "Project not found" in result
+        assert "## 2. create_issue failed\n\nNot a batchable tool" in result
+        assert "## 3. list_sprints failed" in result
+        assert "## 4. get_current_user\n" in result
+
+    def test_argument_types_are_converted(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = {"id": 7, "name": "Sprint 7"}
+
+        result = server.batch.fn([{"tool": "get_sprint", "args": {"sprint_id": "7"}}])
+
+        assert '"name": "Sprint 7"' in result
+
+    def test_calls_share_one_client(self):
+        client = MagicMock()
+        client.myself.return_value = {"name": "jdoe"}
+        headers = {"authorization": "Bearer alice"}
+
+        with (
+            patch("server.jira_client", None),
+            patch("server.get_http_headers", return_value=headers),
+            patch("server.JIRA", return_value=client) as jira_class,
+        ):
+            result = server.batch.fn([{"tool": "get_current_user"} for _ in range(5)])
+
+        assert result.count("jdoe") == 5
+        jira_class.assert_called_once()
+        assert server.batch_client.get() is None
+
+    def test_size_limits(self, mock_jira_client):
+        with pytest.raises(HTTPException) as exc_info:
+            server.batch.fn([])
+        assert exc_info.value.status_code == 400
+
+        with pytest.raises(HTTPException):
+            server.batch.fn([{"tool": "get_current_user"}] * (server.BATCH_MAX_CALLS + 1))
+
+    def test_write_tools_not_batchable(self):
+        assert "get_jira" in server.BATCH_TOOLS
+        assert not {"create_issue", "delete_issue", "batch"} & set(server.BATCH_TOOLS)
+
+    def test_fan_out_tools_not_batchable(self):
+        fan_out = {"get_issues_changes", "get_issue_tree", "aggregate_issues", "sprint_report"}
+        assert not fan_out & set(server.BATCH_TOOLS)
+
+    def test_concurrency_bounded_per_caller(self, mock_jira_client):
+        running = peak = 0
+        lock = threading.Lock()
+
+        def myself():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return {"name": "jdoe"}
+
+        mock_jira_client.myself.side_effect = myself
+
+        with (
+            patch("server.JIRA_MAX_CALLS_PER_CALLER", 2),
+            patch("server.JIRA_MAX_CONCURRENCY", 8),
+        ):
+            result = server.batch.fn([{"tool": "get_current_user"}] * 8)
+
+        assert result.count("jdoe") == 8
+        assert peak == 2
+
+
 class TestCommentOperations:
     """Test comment-related operations"""
 
@@ -337,7 +1050,7 @@ class TestCommentOperations:
         ]
 
         issue = MockJiraIssue("TEST-123", comments=comments)
-        mock_jira_client.issue.return_value = issue
+        mock_jira_client._get_json.return_value = issue.raw
 
         result = server.get_issue_comments.fn("TEST-123")
 
@@ -345,17 +1058,19 @@ class TestCommentOperations:
         assert "Second comment" in result
         assert "Author 1" in result
         assert "Author 2" in result
+        mock_jira_client._get_json.assert_called_once_with(
+            "issue/TEST-123", params={"fields": "comment"}, base=ANY
+        )
 
     @patch("server.ENABLE_WRITE", True)
     def test_delete_comment_success(self, mock_jira_client):
-        comment = MockJiraComment("comment-123", "Test comment")
-        mock_jira_client.comment.return_value = comment
-
         result = server.delete_comment.fn("TEST-123", "comment-123")
 
         assert "Deleted comment comment-123 from TEST-123" in result
-        mock_jira_client.comment.assert_called_once_with("TEST-123", "comment-123")
-        comment.delete.assert_called_once()
+        mock_jira_client._get_url.assert_called_once_with("issue/TEST-123/comment/comment-123")
+        mock_jira_client._session.delete.assert_called_once_with(
+            mock_jira_client._get_url.return_value
+        )
 
 
 class TestUtilityFunctions:
@@ -412,14 +1127,13 @@ class TestErrorHandling:
             mock_jira_client.reset_mock()
 
             # Configure the appropriate mock method to raise an exception
-            if func == server.get_jira.fn:
-                mock_jira_client.issue.side_effect = Exception("Test error")
-            elif func == server.search_issues.fn:
-                mock_jira_client.search_issues.side_effect = Exception("Test error")
-            elif func == server.list_projects.fn:
-                mock_jira_client.projects.side_effect = Exception("Test error")
-            elif func == server.get_project.fn:
-                mock_jira_client.project.side_effect = Exception("Test error")
+            if func in (
+                server.get_jira.fn,
+                server.search_issues.fn,
+                server.list_projects.fn,
+                server.get_project.fn,
+            ):
+                mock_jira_client._get_json.side_effect = Exception("Test error")
 
             with pytest.raises(HTTPException) as exc_info:
                 func(*args)
@@ -473,75 +1187,1242 @@ class TestBoardsAndSprints:
     """Test boards and sprints functionality"""
 
     def test_list_boards_success(self, mock_jira_client):
-        boards = [
-            MagicMock(raw={"id": 1, "name": "Test Board 1"}),
-            MagicMock(raw={"id": 2, "name": "Test Board 2"}),
-        ]
-        mock_jira_client.boards.return_value = boards
+        mock_jira_client._get_json.return_value = {
+            "values": [{"id": 1, "name": "Test Board 1"}, {"id": 2, "name": "Test Board 2"}]
+        }
 
         result = server.list_boards.fn(max_results=5, project_key_or_id="TEST")
 
         assert "Test Board 1" in result
         assert "Test Board 2" in result
-        mock_jira_client.boards.assert_called_once_with(maxResults=5, projectKeyOrID="TEST")
+        mock_jira_client._get_json.assert_called_once_with(
+            "board",
+            params={"maxResults": 5, "projectKeyOrId": "TEST"},
+            base=mock_jira_client.AGILE_BASE_URL,
+        )
 
     def test_list_sprints_success(self, mock_jira_client):
-        sprints = [
-            MagicMock(raw={"id": 1, "name": "Sprint 1", "state": "active"}),
-            MagicMock(raw={"id": 2, "name": "Sprint 2", "state": "closed"}),
-        ]
-        mock_jira_client.sprints.return_value = sprints
+        mock_jira_client._get_json.return_value = {
+            "values": [
+                {"id": 1, "name": "Sprint 1", "state": "active"},
+                {"id": 2, "name": "Sprint 2", "state": "closed"},
+            ]
+        }
 
         result = server.list_sprints.fn(board_id=123, max_results=10)
 
         assert "Sprint 1" in result
         assert "Sprint 2" in result
-        mock_jira_client.sprints.assert_called_once_with(123, maxResults=10)
+        mock_jira_client._get_json.assert_called_once_with(
+            "board/123/sprint", params={"maxResults": 10}, base=mock_jira_client.AGILE_BASE_URL
+        )
 
     def test_get_sprint_success(self, mock_jira_client):
-        sprint = MagicMock(raw={"id": 456, "name": "Test Sprint", "state": "active"})
-        mock_jira_client.sprint.return_value = sprint
+        mock_jira_client._get_json.return_value = {"id": 456, "name": "Test Sprint"}
 
         result = server.get_sprint.fn(456)
 
         assert "Test Sprint" in result
-        mock_jira_client.sprint.assert_called_once_with(456)
+        mock_jira_client._get_json.assert_called_once_with(
+            "sprint/456", params=None, base=mock_jira_client.AGILE_BASE_URL
+        )
+
+    def test_get_sprints_by_name_pages(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = [
+            {"isLast": False, "values": [{"id": 1, "name": "Sprint 1"}]},
+            {"isLast": True, "values": [{"id": 2, "name": "Sprint 2"}]},
+        ]
+
+        result = server.get_sprints_by_name.fn(123, state="closed")
+
+        assert '"Sprint 2": {' in result
+        assert mock_jira_client._get_json.call_args[1]["params"] == {
+            "state": "closed",
+            "startAt": 1,
+        }
+
+    def test_get_sprints_by_name_duplicates(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = {
+            "isLast": True,
+            "values": [{"id": 1, "name": "Sprint 1"}, {"id": 2, "name": "Sprint 1"}],
+        }
+
+        with pytest.raises(HTTPException) as exc_info:
+            server.get_sprints_by_name.fn(123)
+
+        assert exc_info.value.status_code == 500
+        assert "more than one sprint named Sprint 1" in exc_info.value.detail
+
+
+def raw_issue(key, status="Open", category="new", assignee=None, issuetype="Story", points=None):
+    return {
+        "key": key,
+        "fields": {
+            "status": {"name": status, "statusCategory": {"key": category, "name": category}},
+            "assignee": {"displayName": assignee} if assignee else None,
+            "issuetype": {"name": issuetype},
+            server.STORY_POINTS_FID: points,
+        },
+    }
+
+
+class TestSprintReport:
+    """Test the sprint_report tool"""
+
+    def test_sprint_report_aggregates(self, mock_jira_client):
+        def get_json(path, params=None, base=None):
+            if path == "sprint/7":
+                return {"id": 7, "name": "Sprint 7", "state": "active", "self": "https://x"}
+            if path == "search":
+                return {
+                    "total": 3,
+                    "issues": [
+                        raw_issue("TEST-1", "Closed", "done", "Jane", points=5),
+                        raw_issue("TEST-2", "In Progress", "indeterminate", "Jane", points=3),
+                        raw_issue("TEST-3", issuetype="Bug"),
+                    ],
+                }
+            return {"id": 3, "name": "Team board", "type": "scrum"}
+
+        mock_jira_client._get_json.side_effect = get_json
+
+        result = json.loads(server.sprint_report.fn(3, 7).strip("`json\n"))
+
+        assert result["sprint"] == {"id": 7, "name": "Sprint 7", "state": "active"}
+        assert result["board"] == {"id": 3, "name": "Team board"}
+        assert result["issues"] == 3
+        assert result["completion"] == 0.333
+        assert result["story_points"] == {
+            "total": 8,
+            "done": 5,
+            "unestimated_issues": 1,
+            "completion": 0.625,
+        }
+        assert result["by_assignee"] == {"Jane": 2, "Unassigned": 1}
+        assert result["by_issuetype"] == {"Story": 2, "Bug": 1}
+        [search] = search_calls(mock_jira_client)
+        assert search["jql"] == "sprint = 7"
+        assert server.STORY_POINTS_FID in search["fields"].split(",")
+
+    def test_sprint_report_non_numeric_points(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = lambda path, params=None, base=None: (
+            {
+                "total": 2,
+                "issues": [
+                    raw_issue("TEST-1", "Closed", "done", points=2.5),
+                    raw_issue("TEST-2", points="L"),
+                ],
+            }
+            if path == "search"
+            else {"id": 7, "name": "Sprint 7"}
+        )
+
+        result = json.loads(server.sprint_report.fn(3, 7).strip("`json\n"))
+
+        assert result["story_points"] == {
+            "total": 2.5,
+            "done": 2.5,
+            "unestimated_issues": 1,
+            "completion": 1.0,
+        }
+
+    def test_iter_search_raw_pages(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = [
+            {"total": 3, "issues": [raw_issue("TEST-1"), raw_issue("TEST-2")]},
+            {"total": 3, "issues": [raw_issue("TEST-3")]},
+        ]
+
+        keys = [i["key"] for i in server.iter_search_raw(mock_jira_client, "x", [], page_size=2)]
+
+        assert keys == ["TEST-1", "TEST-2", "TEST-3"]
+        assert search_calls(mock_jira_client)[1]["startAt"] == 2
+
+    def test_sprint_report_not_found(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = Exception("Sprint does not exist")
+
+        with pytest.raises(HTTPException) as exc_info:
+            server.sprint_report.fn(3, 999)
+
+        assert exc_info.value.status_code == 404
+
+
+class TestAggregateIssues:
+    """Test the aggregate_issues tool"""
+
+    def _pages(self, issues, page_size):
+        def search(path, params=None, base=None):
+            start = params["startAt"]
+            return {"total": len(issues), "issues": issues[start : start + page_size]}
+
+        return search
+
+    def test_group_by_and_metrics(self, mock_jira_client):
+        issues = [
+            raw_issue("TEST-1", "Open", assignee="Jane", points=3),
+            raw_issue("TEST-2", "Open", assignee="Jane", points=5),
+            raw_issue("TEST-3", "Done", assignee="Jane"),
+            raw_issue("TEST-4", "Open"),
+        ]
+        mock_jira_client._get_json.side_effect = self._pages(issues, 500)
+
+        result = server.aggregate_issues.fn(
+            "project = TEST",
+            ["status", "assignee"],
+            ["count", "sum:story_points", "avg:story_points"],
+        )
+
+        lines = result.splitlines()
+        assert lines[0] == "| status | assignee | count | sum:story_points | avg:story_points |"
+        assert lines[2] == "| Open | Jane | 2 | 8 | 4.0 |"
+        assert "| Open | (none) | 1 | 0 | None |" in lines
+        assert "4 issues in 3 groups." in result
+        fields = search_calls(mock_jira_client)[0]["fields"]
+        assert fields == ",".join(sorted(["status", "assignee", server.STORY_POINTS_FID]))
+
+    def test_pages_through_large_results(self, mock_jira_client):
+        issues = [
+            raw_issue(f"TEST-{i}", issuetype=("Bug" if i % 3 else "Story")) for i in range(5000)
+        ]
+        mock_jira_client._get_json.side_effect = self._pages(issues, 100)
+
+        result = server.aggregate_issues.fn("project = TEST", ["type"])
+
+        assert "| Bug | 3333 |" in result
+        assert "| Story | 1667 |" in result
+        assert "5000 issues in 2 groups." in result
+        assert len(search_calls(mock_jira_client)) == 50
+        assert search_calls(mock_jira_client)[1]["maxResults"] == 100
+
+    def test_multi_valued_fields_and_max_groups(self, mock_jira_client):
+        issue = raw_issue("TEST-1")
+        issue["fields"]["labels"] = ["a", "b", "c"]
+        mock_jira_client._get_json.side_effect = self._pages([issue], 500)
+
+        result = server.aggregate_issues.fn("project = TEST", ["labels"], max_groups=2)
+
+        assert "| a | 1 |" in result and "| b | 1 |" in result
+        assert "1 issues in 3 groups." in result
+        assert "raise max_groups" in result
+
+    def test_unknown_metric(self, mock_jira_client):
+        with pytest.raises(HTTPException) as exc_info:
+            server.aggregate_issues.fn("project = TEST", ["status"], ["median:story_points"])
+
+        assert exc_info.value.status_code == 400
 
 
 class TestLabelOperations:
     """Test label operations"""
 
     @patch("server.ENABLE_WRITE", True)
-    def test_add_issue_labels_success(self, mock_jira_client, sample_issue):
-        sample_issue.fields.labels = ["existing-label"]
-        mock_jira_client.issue.return_value = sample_issue
-
+    def test_add_issue_labels_success(self, mock_jira_client):
         result = server.add_issue_labels.fn("TEST-123", ["new-label", "another-label"])
 
         assert "Added labels ['new-label', 'another-label'] to issue TEST-123" in result
-        sample_issue.update.assert_called_once()
+        mock_jira_client.issue.assert_not_called()
 
-        # Check that new labels were added to existing ones
-        call_args = sample_issue.update.call_args[1]["fields"]["labels"]
-        assert "existing-label" in call_args
-        assert "new-label" in call_args
-        assert "another-label" in call_args
+        # Labels are added in place, keeping the existing ones
+        assert put_payload(mock_jira_client) == {
+            "update": {"labels": [{"add": "new-label"}, {"add": "another-label"}]}
+        }
 
     @patch("server.ENABLE_WRITE", True)
-    def test_remove_issue_labels_success(self, mock_jira_client, sample_issue):
-        sample_issue.fields.labels = ["label1", "label2", "label3"]
-        mock_jira_client.issue.return_value = sample_issue
-
+    def test_remove_issue_labels_success(self, mock_jira_client):
         result = server.remove_issue_labels.fn("TEST-123", ["label2"])
 
         assert "Removed labels ['label2'] from issue TEST-123" in result
-        sample_issue.update.assert_called_once()
+        assert put_payload(mock_jira_client) == {"update": {"labels": [{"remove": "label2"}]}}
+
+
+class TestAttachments:
+    """Test listing and reading attachments"""
+
+    LOG = b"".join(b"line %03d\n" % n for n in range(100))
+
+    @pytest.fixture
+    def attachment(self, mock_jira_client):
+        attachment = {
+            "id": "10001",
+            "filename": "server.log",
+            "size": len(self.LOG),
+            "mimeType": "text/plain",
+            "content": "https://test.example.com/secure/attachment/10001/server.log",
+        }
+        mock_jira_client._get_json.return_value = attachment
+        return attachment
+
+    def _serve(self, client, content, honor_range=True):
+        """Serve content from the mock session in 16 byte chunks, tracking bytes sent"""
+        sent = []
+
+        def get(url, headers=None, stream=False):
+            response = MagicMock()
+            data = content
+            if honor_range and headers:
+                first, last = headers["Range"][len("bytes=") :].split("-")
+                data = content[int(first) : int(last) + 1]
+            response.status_code = 206 if honor_range and headers else 200
+
+            def iter_content(size):
+                for i in range(0, len(data), 16):
+                    sent.append(len(data[i : i + 16]))
+                    yield data[i : i + 16]
+
+            response.iter_content.side_effect = iter_content
+            return response
+
+        client._session.get.side_effect = get
+        return sent
+
+    def test_list_attachments(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = {
+            "fields": {
+                "attachment": [
+                    {
+                        "id": "10001",
+                        "filename": "server.log",
+                        "size": 900,
+                        "mimeType": "text/plain",
+                        "created": "2023-01-01T00:00:00.000+0000",
+                        "author": {"displayName": "Jane Doe"},
+                        "content": "https://test.example.com/secure/attachment/10001",
+                    }
+                ]
+            }
+        }
+
+        result = server.list_attachments.fn("TEST-1")
+
+        assert '"filename": "server.log"' in result
+        assert '"author": "Jane Doe"' in result
+        assert "content" not in result
+        assert mock_jira_client._get_json.call_args[1]["params"] == {"fields": "attachment"}
+
+    def test_reads_requested_range_only(self, mock_jira_client, attachment):
+        sent = self._serve(mock_jira_client, self.LOG)
+
+        result = server.get_attachment.fn("10001", byte_range="9-26")
+
+        assert "line 001\nline 002\n" in result
+        assert "Bytes 9-26:" in result
+        assert 'byte_range="27-"' in result
+        assert mock_jira_client._session.get.call_args[1]["headers"] == {"Range": "bytes=9-26"}
+        assert sum(sent) == 18
+
+    def test_tail_read(self, mock_jira_client, attachment):
+        self._serve(mock_jira_client, self.LOG)
+
+        result = server.get_attachment.fn("10001", byte_range="-9")
+
+        assert "line 099\n" in result
+        assert "line 098" not in result
+        assert "Continue" not in result
+
+    def test_max_bytes_stops_download(self, mock_jira_client, attachment):
+        sent = self._serve(mock_jira_client, self.LOG, honor_range=False)
+
+        result = server.get_attachment.fn("10001", max_bytes=20, byte_range="18-")
+
+        assert "line 002\nline 003\n" in result
+        assert sum(sent) == 48
+
+    def test_invalid_range(self, mock_jira_client, attachment):
+        with pytest.raises(HTTPException) as exc_info:
+            server.get_attachment.fn("10001", byte_range="2000-")
+
+        assert exc_info.value.status_code == 400
+
+    def test_binary_content(self, mock_jira_client, attachment):
+        attachment.update(filename="core.bin", size=4, mimeType="application/octet-stream")
+        self._serve(mock_jira_client, b"\x00\x01\x02\x03")
+
+        result = server.get_attachment.fn("10001")
+
+        assert "base64" in result and "AAECAw==" in result
+
+    def test_disk_cache(self, mock_jira_client, attachment, tmp_path):
+        cache = server.AttachmentCache(str(tmp_path), 10000, 1000)
+        self._serve(mock_jira_client, self.LOG)
+        cache.store(mock_jira_client, attachment)
+        mock_jira_client._session.get.reset_mock()
+
+        with patch("server.attachment_cache", cache):
+            result = server.get_attachment.fn("10001", byte_range="-9")
+
+        assert "line 099" in result
+        mock_jira_client._session.get.assert_not_called()
+        sha = server.hashlib.sha256(self.LOG).hexdigest()
+        assert (tmp_path / "objects" / sha).read_bytes() == self.LOG
+        assert (tmp_path / "ids" / "10001").read_text() == sha
+
+    def test_disk_cache_evicts_least_recently_read(self, mock_jira_client, attachment, tmp_path):
+        cache = server.AttachmentCache(str(tmp_path), len(self.LOG) * 2, len(self.LOG))
+        self._serve(mock_jira_client, self.LOG)
+        cache.store(mock_jira_client, attachment)
+        old = time.time() - 60
+        for path in (tmp_path / "objects").iterdir():
+            os.utime(path, (old, old))
+        first = dict(attachment, id="10002", content="https://jira.example.com/a/2")
+        self._serve(mock_jira_client, self.LOG[::-1])
+        cache.store(mock_jira_client, first)
+        assert cache.path(attachment) is not None
+
+        self._serve(mock_jira_client, self.LOG.upper())
+        cache.store(mock_jira_client, dict(attachment, id="10003"))
+
+        assert cache.path(attachment) is not None
+        assert cache.path(first) is None
+        assert not (tmp_path / "ids" / "10002").exists()
+        assert len(list((tmp_path / "objects").iterdir())) == 2
+
+    def test_disk_cache_skips_large_files(self, mock_jira_client, attachment, tmp_path):
+        cache = server.AttachmentCache(str(tmp_path), 10000, len(self.LOG) - 1)
+
+        with patch("server.threading.Thread") as thread:
+            cache.store_in_background(mock_jira_client, attachment)
+
+        thread.assert_not_called()
+
+    def test_disk_cache_removes_stale_downloads(self, tmp_path):
+        old = time.time() - 2 * server.AttachmentCache.STALE_DOWNLOAD_SECONDS
+        for path in (tmp_path / "notes.txt", tmp_path / "tmp" / "old", tmp_path / "tmp" / "new"):
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(b"partial")
+            if path.name != "new":
+                os.utime(path, (old, old))
+
+        server.AttachmentCache(str(tmp_path), 10000, 1000)
+
+        assert (tmp_path / "notes.txt").exists()
+        assert [p.name for p in (tmp_path / "tmp").iterdir()] == ["new"]
+
+
+class TestIssueStore:
+    """Test the local SQLite issue store"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        store = server.IssueStore(str(tmp_path / "issues.db"), ["TEST"])
+        yield store
+        store.close()
+
+    def _synced(self, store, mock_jira_client, issues):
+        mock_jira_client._get_json.return_value = search_result(issues)
+        store.sync_project(mock_jira_client, "TEST")
+
+    def test_sync_project_initial_and_incremental(self, store, mock_jira_client):
+        self._synced(store, mock_jira_client, [MockJiraIssue("TEST-1", "First")])
+
+        [search] = search_calls(mock_jira_client)
+        assert search["jql"] == 'project = "TEST"'
+        assert search["fields"] == ",".join(
+            server.issue_fields(server.field_registry.resolve()) + ["comment"]
+        )
+
+        self._synced(store, mock_jira_client, [MockJiraIssue("TEST-1", "Renamed")])
+
+        jql = search_calls(mock_jira_client)[-1]["jql"]
+        assert jql.startswith('project = "TEST" AND updated >= "-')
+        assert store.get_issue("TEST-1")["summary"] == "Renamed"
+
+    def test_reconcile_removes_deleted_and_moved_issues(self, store, mock_jira_client):
+        issues = [MockJiraIssue(f"TEST-{n}", f"Issue {n}") for n in (1, 2, 3)]
+
+        def listings():
+            return [c for c in search_calls(mock_jira_client) if c["fields"] == "key"]
+
+        for _ in range(server.IssueStore.RECONCILE_EVERY):
+            self._synced(store, mock_jira_client, issues)
+        assert listings() == []
+
+        self._synced(store, mock_jira_client, issues[:1])
+
+        [listing] = listings()
+        assert listing["jql"] == 'project = "TEST" ORDER BY key'
+        assert store.get_issue("TEST-1") is not None
+        assert store.get_issue("TEST-2") is None
+        assert store.get_issue("TEST-3") is None
+
+    def test_reconcile_after_restart(self, store, mock_jira_client, tmp_path):
+        issues = [MockJiraIssue(f"TEST-{n}", f"Issue {n}") for n in (1, 2)]
+        self._synced(store, mock_jira_client, issues)
+        restarted = server.IssueStore(str(tmp_path / "issues.db"), ["TEST"])
+
+        self._synced(restarted, mock_jira_client, issues[:1])
+
+        assert restarted.get_issue("TEST-2") is None
+        restarted.close()
+
+    def test_reconcile_skipped_when_issues_change_while_listing(self, store, mock_jira_client):
+        issues = [MockJiraIssue(f"TEST-{n}", f"Issue {n}") for n in (1, 2, 3)]
+        self._synced(store, mock_jira_client, issues)
+        # An issue deleted between pages shifts TEST-3 out of the listing
+        mock_jira_client._get_json.side_effect = [
+            {"startAt": 0, "total": 3, "issues": [{"key": "TEST-1"}, {"key": "TEST-2"}]},
+            {"startAt": 2, "total": 2, "issues": []},
+        ]
+
+        assert store.reconcile(mock_jira_client, "TEST") == 0
+        assert store.get_issue("TEST-3") is not None
+
+    def test_get_jira_served_from_store(self, store, mock_jira_client):
+        self._synced(store, mock_jira_client, [MockJiraIssue("TEST-1", "Cached", "Body")])
+
+        with patch("server.issue_store", store):
+            result = server.get_jira.fn("TEST-1")
+
+        assert result == "# TEST-1: Cached\n\nBody"
+        assert issue_calls(mock_jira_client) == []
+
+    def test_get_jira_stale_falls_through(self, store, mock_jira_client, sample_issue):
+        self._synced(store, mock_jira_client, [MockJiraIssue("TEST-123", "Cached")])
+        mock_jira_client._get_json.return_value = sample_issue.raw
+
+        with patch("server.issue_store", store):
+            result = server.get_jira.fn("TEST-123", max_age=0)
+
+        assert result == "# TEST-123: Test Issue\n\nThis is a test issue"
+        assert issue_calls(mock_jira_client) == ["issue/TEST-123"]
+
+    def test_search_issues_simple_project_query(self, store, mock_jira_client):
+        self._synced(
+            store,
+            mock_jira_client,
+            [
+                MockJiraIssue("TEST-2", "Older", updated="2023-01-01T00:00:00.000+0000"),
+                MockJiraIssue("TEST-10", "Newer", updated="2023-02-01T00:00:00.000+0000"),
+            ],
+        )
+        mock_jira_client._get_json.reset_mock()
+
+        with patch("server.issue_store", store):
+            result = server.search_issues.fn("project = TEST ORDER BY updated DESC")
+            by_key = server.search_issues.fn("project = test ORDER BY key ASC", max_results=1)
+
+        assert result.index("TEST-10") < result.index("TEST-2")
+        assert "TEST-2" in by_key and "TEST-10" not in by_key
+        assert search_calls(mock_jira_client) == []
+
+    def test_search_issues_other_queries_fall_through(self, store, mock_jira_client):
+        self._synced(store, mock_jira_client, [MockJiraIssue("TEST-1", "Cached")])
+        mock_jira_client._get_json.reset_mock()
+        mock_jira_client._get_json.return_value = search_result(
+            [MockJiraIssue("OTHER-1", "Remote")]
+        )
+
+        with patch("server.issue_store", store):
+            result = server.search_issues.fn("project = OTHER")
+
+        assert "Remote" in result
+        assert search_calls(mock_jira_client) == [
+            {
+                "jql": "project = OTHER",
+                "startAt": 0,
+                "maxResults": 100,
+                "fields": ",".join(server.issue_fields(server.field_registry.resolve())),
+            }
+        ]
+
+    @patch("server.ENABLE_WRITE", True)
+    def test_reads_after_write_go_to_jira_until_next_sync(self, store, mock_jira_client):
+        self._synced(store, mock_jira_client, [MockJiraIssue("TEST-1", "Old", status_name="Open")])
+        renamed = MockJiraIssue("TEST-1", "New", status_name="Closed")
+        mock_jira_client._get_json.side_effect = lambda path, **kwargs: (
+            search_result([renamed]) if path == "search" else renamed.raw
+        )
+
+        with patch("server.issue_store", store):
+            server.update_issue.fn("TEST-1", summary="New")
+            issue = server.get_jira.fn("TEST-1")
+            again = server.get_jira.fn("TEST-1")
+            found = server.search_issues.fn("project = TEST AND status = open")
+
+        assert issue == again == "# TEST-1: New\n\nTest Description"
+        assert issue_calls(mock_jira_client) == ["issue/TEST-1", "issue/TEST-1"]
+        assert len(search_calls(mock_jira_client)) == 2
+        assert "TEST-1" in found
+
+        store.sync_project(mock_jira_client, "TEST")
+
+        assert store.get_issue("TEST-1")["summary"] == "New"
+        assert store.search("project = TEST AND status = open", 10) == []
+
+
+class TestJqlQuery:
+    """Test the JQL subset parser used by the local issue store"""
+
+    def test_parse_conditions_and_order(self):
+        query = server.JqlQuery(
+            'project = X AND status = "In Progress" AND assignee = currentUser() '
+            "ORDER BY updated DESC",
+            current_user=lambda: "jdoe",
+        )
+
+        assert query.projects == {"X"}
+        assert query.params == ["X", "In Progress", "jdoe", "jdoe"]
+        assert query.order_by == "updated_ts DESC"
+
+    def test_order_by_key_sorts_by_project_first(self):
+        query = server.JqlQuery("project in (A, B) ORDER BY key DESC, created")
+
+        assert query.order_by == "project DESC, key_num DESC, created_ts ASC"
+
+    def test_project_scope_of_or(self):
+        bounded = server.JqlQuery("project in (A, b) OR (project = C AND status = Done)")
+        unbounded = server.JqlQuery("project = A OR status = Done")
+
+        assert bounded.projects == {"A", "B", "C"}
+        assert unbounded.projects is None
 
-        # Check that only specified labels were removed
-        call_args = sample_issue.update.call_args[1]["fields"]["labels"]
-        assert "label1" in call_args
-        assert "label2" not in call_args
-        assert "label3" in call_args
+    def test_relative_dates(self):
+        query = server.JqlQuery("project = A AND updated >= -2d", now=1_000_000)
+
+        assert query.where == "(project IN (?) AND updated_ts >= ?)"
+        assert query.params == ["A", 1_000_000 - 2 * 86400]
+
+    @pytest.mark.parametrize(
+        "jql",
+        [
+            'text ~ "crash"',
+            "project = A AND updated >= 2023-01-01",
+            "project = A AND fixVersion = 1.0",
+            "project = A ORDER BY priority",
+            "project = A AND assignee in membersOf(devs)",
+            "project = A AND (status = Done",
+        ],
+    )
+    def test_unsupported_queries(self, jql):
+        with pytest.raises(server.UnsupportedJqlError):
+            server.JqlQuery(jql)
+
+    def test_search_evaluates_subset(self, tmp_path, mock_jira_client):
+        store = server.IssueStore(str(tmp_path / "issues.db"), ["TEST"])
+        mock_jira_client._get_json.return_value = search_result(
+            [
+                MockJiraIssue(
+                    "TEST-1", "Mine", status_name="In Progress", assignee="Me", assignee_name="me"
+                ),
+                MockJiraIssue("TEST-2", "Theirs", status_name="In Progress", assignee="Them"),
+                MockJiraIssue(
+                    "TEST-3", "Done", status_name="Done", assignee="Me", assignee_name="me"
+                ),
+            ]
+        )
+        store.sync_project(mock_jira_client, "TEST")
+
+        result = store.search(
+            'project = TEST AND status = "in progress" AND assignee = currentUser()',
+            10,
+            current_user=lambda: "me",
+        )
+        unassigned = store.search("project = TEST AND assignee is EMPTY", 10)
+        outside = store.search('project = TEST AND summary ~ "Mine"', 10)
+        store.close()
+
+        assert [issue["key"] for issue in result] == ["TEST-1"]
+        assert unassigned == []
+        assert outside is None
+
+    @pytest.mark.parametrize(
+        "condition, expected",
+        [
+            ("assignee is EMPTY", ["TEST-1"]),
+            ("assignee = EMPTY", ["TEST-1"]),
+            ("assignee = null", ["TEST-1"]),
+            ("assignee in (EMPTY)", ["TEST-1"]),
+            ("assignee in (them, EMPTY)", ["TEST-1", "TEST-2"]),
+            ("assignee != EMPTY", ["TEST-2", "TEST-3"]),
+            ("assignee not in (EMPTY, them)", ["TEST-3"]),
+            ('assignee = "EMPTY"', []),
+        ],
+    )
+    def test_empty_values(self, tmp_path, mock_jira_client, condition, expected):
+        store = server.IssueStore(str(tmp_path / "issues.db"), ["TEST"])
+        mock_jira_client._get_json.return_value = search_result(
+            [
+                MockJiraIssue("TEST-1"),
+                MockJiraIssue("TEST-2", assignee="Them", assignee_name="them"),
+                MockJiraIssue("TEST-3", assignee="Me", assignee_name="me"),
+            ]
+        )
+        store.sync_project(mock_jira_client, "TEST")
+
+        result = store.search(f"project = TEST AND {condition} ORDER BY key", 10)
+        store.close()
+
+        assert [issue["key"] for issue in result] == expected
+
+    def test_empty_with_other_operators(self):
+        with pytest.raises(server.UnsupportedJqlError):
+            server.JqlQuery("project = A AND updated > EMPTY")
+
+
+class TestFulltextSearch:
+    """Test the full-text index of the local issue store"""
+
+    @pytest.fixture
+    def store(self, tmp_path, mock_jira_client):
+        store = server.IssueStore(str(tmp_path / "issues.db"), ["TEST"])
+        mock_jira_client._get_json.return_value = search_result(
+            [
+                MockJiraIssue("TEST-1", "Kernel panic on boot", "Stack trace attached"),
+                MockJiraIssue(
+                    "TEST-2",
+                    "Slow dashboard",
+                    "Loading takes minutes",
+                    comments=[MockJiraComment("10", "Seeing a kernel panic here too")],
+                ),
+                MockJiraIssue("TEST-3", "Unrelated", "Nothing to see"),
+            ]
+        )
+        store.sync_project(mock_jira_client, "TEST")
+        yield store
+        store.close()
+
+    def test_ranks_summary_above_comment(self, store, mock_jira_client):
+        mock_jira_client.reset_mock()
+
+        with patch("server.issue_store", store):
+            result = server.fulltext_search.fn("kernel panic")
+
+        assert result.index("TEST-1") < result.index("TEST-2")
+        assert "TEST-3" not in result
+        assert '"comment_id": "10"' in result
+        assert "**kernel**" in result.lower()
+        assert search_calls(mock_jira_client) == []
+
+    def test_phrases_and_prefixes(self, store):
+        assert [r["key"] for r in store.fulltext_search('"takes minutes"', 10)] == ["TEST-2"]
+        assert store.fulltext_search('"minutes takes"', 10) == []
+        assert [r["key"] for r in store.fulltext_search("dash*", 10)] == ["TEST-2"]
+
+    def test_comments_are_reindexed(self, store, mock_jira_client):
+        issue = MockJiraIssue("TEST-2", "Slow dashboard", comments=[MockJiraComment("11", "fixed")])
+        mock_jira_client._get_json.return_value = issue.raw
+
+        with patch("server.issue_store", store):
+            server.get_issue_comments.fn("TEST-2")
+
+        assert store.fulltext_search("panic", 10)[0]["key"] == "TEST-1"
+        assert len(store.fulltext_search("panic", 10)) == 1
+        assert store.fulltext_search("fixed", 10)[0]["comment_id"] == "11"
+
+    def test_requires_issue_store(self):
+        with pytest.raises(HTTPException) as exc_info:
+            server.fulltext_search.fn("anything")
+
+        assert exc_info.value.status_code == 400
+
+
+class TestOutputBudget:
+    """Test size limits on search output"""
+
+    def _issues(self, count, description_length):
+        return [
+            server.IssueRecord.from_raw(
+                MockJiraIssue(f"TEST-{i}", f"Issue {i}", "x" * description_length).raw
+            ).as_dict()
+            for i in range(count)
+        ]
+
+    def test_small_output_unchanged(self):
+        issues = self._issues(3, 10)
+
+        assert server.budgeted_markdown(issues, 100_000) == server.to_markdown(issues)
+        assert server.budgeted_markdown(issues, 0) == server.to_markdown(issues)
+
+    def test_descriptions_shortened_first(self):
+        issues = self._issues(10, 5000)
+
+        result = server.budgeted_markdown(issues, 10_000)
+
+        assert len(result) <= 10_000
+        assert all(f"TEST-{i}" in result for i in range(10))
+        assert '"reporter"' in result
+        assert "10 descriptions cut to" in result
+        assert "Call get_jira for the full text" in result
+
+    def test_fields_then_issues_dropped(self):
+        issues = self._issues(200, 100)
+
+        result = server.budgeted_markdown(issues, 5_000)
+
+        assert len(result) <= 5_000
+        assert "TEST-0" in result and "TEST-199" not in result
+        assert '"description"' not in result
+        assert "fields removed: description" in result
+        assert "issues left out" in result
+        assert "lower max_results" in result
+
+    @pytest.mark.parametrize("max_chars", [10, 100, 399])
+    def test_limits_below_note_reserve(self, max_chars):
+        result = server.budgeted_markdown(self._issues(5, 100), max_chars)
+
+        assert len(result) <= max_chars
+        assert result.startswith("_Output")
+
+    def test_search_issues_max_output_chars(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = search_result(
+            [MockJiraIssue("TEST-1", "Long", "y" * 50_000)]
+        )
+
+        result = server.search_issues.fn("project = TEST", max_output_chars=2_000)
+
+        assert len(result) <= 2_000
+        assert "TEST-1" in result
+        assert "characters elided" in result
+
+
+@pytest.fixture
+def memory_caches():
+    """Enable the in-memory caches for a test"""
+    caches = {
+        name: server.TTLCache(ttl=60, maxsize=100)
+        for name in ("issue_cache", "comment_cache", "search_cache")
+    }
+    with (
+        patch("server.issue_cache", caches["issue_cache"]),
+        patch("server.comment_cache", caches["comment_cache"]),
+        patch("server.search_cache", caches["search_cache"]),
+    ):
+        yield caches
+
+
+class TestMemoryCaches:
+    """Test the in-memory issue, comment and search caches"""
+
+    def test_ttl_cache_expiry_and_eviction(self):
+        cache = server.TTLCache(ttl=60, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        with patch("server.time.monotonic", return_value=time.monotonic() + 61):
+            assert cache.get("c") is None
+
+    def test_disabled_cache(self):
+        cache = server.TTLCache(ttl=0, maxsize=10)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+    def test_get_jira_cached_until_write(self, mock_jira_client, sample_issue, memory_caches):
+        mock_jira_client._get_json.return_value = sample_issue.raw
+
+        first = server.get_jira.fn("TEST-123")
+        second = server.get_jira.fn("TEST-123")
+
+        assert first == second
+        assert issue_calls(mock_jira_client) == ["issue/TEST-123"]
+
+        with patch("server.ENABLE_WRITE", True):
+            server.update_issue.fn("TEST-123", summary="Changed")
+        server.get_jira.fn("TEST-123")
+
+        assert len(issue_calls(mock_jira_client)) == 2
+
+    def test_cache_is_per_caller(self, mock_jira_client, sample_issue, memory_caches):
+        mock_jira_client._get_json.return_value = sample_issue.raw
+
+        with patch("server.jira_client", None):
+            for token in ("alice", "bob", "alice"):
+                with patch(
+                    "server.get_http_headers", return_value={"authorization": f"Bearer {token}"}
+                ):
+                    server.get_jira.fn("TEST-123")
+
+        assert len(issue_calls(mock_jira_client)) == 2
+
+
+class TestUserDirectory:
+    """Test the cached user lookups"""
+
+    @pytest.fixture
+    def directory(self, mock_jira_client):
+        directory = server.UserDirectory(ttl=60, maxsize=100)
+        mock_jira_client._is_cloud = False
+        with patch("server.user_directory", directory):
+            yield directory
+
+    def _users(self, *names):
+        return [
+            {"accountId": name.split()[0].lower(), "displayName": name, "emailAddress": email}
+            for name, email in (n.split(":") for n in names)
+        ]
+
+    def test_narrower_queries_served_locally(self, mock_jira_client, directory):
+        mock_jira_client._get_json.return_value = self._users(
+            "John Doe:jdoe@example.com", "Joan Smith:joan@example.com", "Bob Ray:jo@example.com"
+        )
+
+        server.search_users.fn("jo", max_results=5)
+        john = server.search_users.fn("John", max_results=5)
+        by_email = server.search_users.fn("joan@", max_results=5)
+        again = server.search_users.fn("jo", max_results=2)
+
+        assert "John Doe" in john and "Joan Smith" not in john
+        assert "Joan Smith" in by_email and "Bob Ray" not in by_email
+        assert "Joan Smith" in again and "Bob Ray" not in again
+        mock_jira_client._get_json.assert_called_once_with(
+            "user/search",
+            params={"username": "jo", "maxResults": server.USER_SEARCH_SIZE},
+            base=mock_jira_client.JIRA_BASE_URL,
+        )
+
+    def test_cloud_results_not_narrowed(self, mock_jira_client, directory):
+        mock_jira_client._is_cloud = True
+        mock_jira_client._get_json.return_value = self._users("John Doe:jdoe@example.com")
+
+        server.search_users.fn("jo", max_results=5)
+        server.search_users.fn("jo", max_results=5)
+        server.search_users.fn("john", max_results=5)
+
+        assert mock_jira_client._get_json.call_count == 2
+        assert mock_jira_client._get_json.call_args[1]["params"]["query"] == "john"
+
+    def test_truncated_results_not_narrowed(self, mock_jira_client, directory):
+        mock_jira_client._get_json.return_value = self._users(
+            *(f"Jo{n} Doe:jo{n}@example.com" for n in range(server.USER_SEARCH_SIZE))
+        )
+
+        server.search_users.fn("jo")
+        server.search_users.fn("jo", max_results=20)
+        server.search_users.fn("jo1")
+
+        assert mock_jira_client._get_json.call_count == 2
+
+    def test_get_user_from_search_results(self, mock_jira_client, directory):
+        mock_jira_client._get_json.return_value = self._users("John Doe:jdoe@example.com")
+        server.get_assignable_users_for_issue.fn("TEST-1", "john")
+
+        result = server.get_user.fn("john")
+
+        assert "John Doe" in result
+        assert mock_jira_client._get_json.call_count == 1
+
+    def test_results_are_per_caller_and_scope(self, mock_jira_client, directory):
+        mock_jira_client._get_json.return_value = self._users("John Doe:jdoe@example.com")
+
+        with patch("server.jira_client", None):
+            for token in ("alice", "bob", "alice"):
+                with patch(
+                    "server.get_http_headers", return_value={"authorization": f"Bearer {token}"}
+                ):
+                    server.search_users.fn("john")
+        server.get_assignable_users_for_project.fn("TEST", "john")
+
+        assert mock_jira_client._get_json.call_count == 3
+
+    def test_refreshed_project_users(self, mock_jira_client, directory):
+        mock_jira_client._get_json.return_value = self._users(
+            "John Doe:jdoe@example.com", "Joan Smith:joan@example.com"
+        )
+        directory.refresh_project(mock_jira_client, "TEST")
+
+        result = server.get_assignable_users_for_project.fn("test", "smi")
+
+        assert "Joan Smith" in result and "John Doe" not in result
+        assert mock_jira_client._get_json.call_count == 1
+
+    def test_disabled_directory(self, mock_jira_client):
+        mock_jira_client._get_json.return_value = []
+
+        server.search_users.fn("john", max_results=5)
+        server.search_users.fn("john", max_results=5)
+
+        assert mock_jira_client._get_json.call_count == 2
+        assert mock_jira_client._get_json.call_args[1]["params"]["maxResults"] == 5
+
+
+class TestWebhookReceiver:
+    """Test applying Jira webhook events to the caches"""
+
+    FIXTURE = Path(__file__).parent / "fixtures" / "jira_webhook_events.jsonl"
+
+    @pytest.fixture
+    def primed(self, mock_jira_client, memory_caches):
+        issue = MockJiraIssue(
+            "TEST-1", "Old", comments=[MockJiraComment("500", "Original comment")]
+        )
+        mock_jira_client._get_json.side_effect = lambda path, **kwargs: (
+            search_result([issue]) if path == "search" else issue.raw
+        )
+        server.get_jira.fn("TEST-1")
+        server.get_issue_comments.fn("TEST-1")
+        server.search_issues.fn("project = TEST")
+        mock_jira_client.reset_mock()
+        return memory_caches
+
+    def test_replay_fixture_feed(self, mock_jira_client, primed):
+        assert server.replay_webhook_events(self.FIXTURE) == 6
+
+        issue = server.get_jira.fn("TEST-1")
+        comments = server.get_issue_comments.fn("TEST-1")
+
+        assert issue == "# TEST-1: Crash when saving settings\n\nSaving twice crashes the app"
+        assert "Original comment" in comments
+        assert "Reproduced on 2.3 and 2.4" in comments
+        assert "Typo here" not in comments
+        assert len(primed["search_cache"]) == 0
+        assert issue_calls(mock_jira_client) == []
+
+    def test_events_for_uncached_issues_are_ignored(self, primed):
+        server.replay_webhook_events(self.FIXTURE)
+
+        assert primed["issue_cache"].get(("env", "TEST-2")) is None
+
+    def test_http_endpoint(self, primed):
+        from starlette.testclient import TestClient
+
+        client = TestClient(server.mcp.http_app())
+        event = json.loads(self.FIXTURE.read_text().splitlines()[0])
+
+        with patch("server.JIRA_WEBHOOK_SECRET", "s3cret"):
+            denied = client.post("/webhook/jira?secret=wrong", json=event)
+            accepted = client.post("/webhook/jira?secret=s3cret", json=event)
+
+        assert denied.status_code == 404
+        assert accepted.status_code == 200
+        assert accepted.json() == {"issue": "TEST-1"}
+        assert primed["issue_cache"].get(("env", "TEST-1")).status == "In Progress"
+
+    def test_lower_case_lookups_are_updated(self, mock_jira_client, primed):
+        server.get_jira.fn("test-1")
+        server.get_issue_comments.fn("test-1")
+
+        server.replay_webhook_events(self.FIXTURE)
+
+        assert server.get_jira.fn("test-1").startswith("# test-1: Crash when saving settings")
+        assert "Reproduced on 2.3 and 2.4" in server.get_issue_comments.fn("test-1")
+        assert issue_calls(mock_jira_client) == []
+
+    def test_restricted_comment_drops_cached_comments(self, primed):
+        event = {
+            "webhookEvent": "comment_created",
+            "issue": {"key": "TEST-1"},
+            "comment": {
+                "id": "501",
+                "body": "Only for developers",
+                "visibility": {"type": "role", "value": "Developers"},
+            },
+        }
+
+        server.apply_webhook_event(event)
+
+        assert primed["comment_cache"].get(("env", "TEST-1")) is None
+
+    def test_http_endpoint_rejects_malformed_events(self, primed):
+        from starlette.testclient import TestClient
+
+        client = TestClient(server.mcp.http_app())
+        events = [
+            {"webhookEvent": "comment_created", "issue": {"key": "TEST-1"}},
+            {"webhookEvent": "comment_deleted", "issue": {"key": "TEST-1"}, "comment": "500"},
+            ["not", "an", "object"],
+        ]
+
+        with patch("server.JIRA_WEBHOOK_SECRET", "s3cret"):
+            responses = [client.post("/webhook/jira?secret=s3cret", json=e) for e in events]
+
+        assert [r.status_code for r in responses] == [400, 400, 400]
+        assert "Original comment" in server.get_issue_comments.fn("TEST-1")
+
+
+def make_history(created, field, from_string, to_string, author="Jane Doe"):
+    return {
+        "created": created,
+        "author": {"displayName": author},
+        "items": [{"field": field, "fromString": from_string, "toString": to_string}],
+    }
+
+
+class TestIssueChanges:
+    """Test the changelog tools"""
+
+    def test_parse_since(self):
+        assert server.parse_since("-2h", now=10_000) == 10_000 - 7200
+        assert server.parse_since("2025-01-06") == 1736121600
+        assert server.parse_since("2025-01-06T10:00:00+01:00") == 1736121600 + 9 * 3600
+
+    def test_get_issue_changes_paginates_and_filters(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = [
+            {
+                "changelog": {
+                    "total": 3,
+                    "histories": [
+                        make_history("2025-01-01T00:00:00.000+0000", "status", "New", "Open"),
+                        make_history("2025-01-05T00:00:00.000+0000", "priority", "Low", "High"),
+                    ],
+                }
+            },
+            {"values": [make_history("2025-01-06T00:00:00.000+0000", "status", "Open", "Done")]},
+        ]
+
+        result = server.get_issue_changes.fn("TEST-1", since="2025-01-02")
+
+        assert '"New"' not in result
+        assert result.index('"Low"') < result.index('"Done"')
+        second_call = mock_jira_client._get_json.call_args_list[1]
+        assert second_call[0][0] == "issue/TEST-1/changelog"
+        assert second_call[1]["params"]["startAt"] == 2
+
+    def test_get_issue_changes_invalid_since(self, mock_jira_client):
+        with pytest.raises(HTTPException) as exc_info:
+            server.get_issue_changes.fn("TEST-1", since="yesterday")
+
+        assert exc_info.value.status_code == 400
+
+    def test_get_issues_changes_batch(self, mock_jira_client):
+        recent = server.datetime.now(server.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000%z")
+
+        def get_json(path, params=None, base=None):
+            if path == "search":
+                return {"issues": [{"key": "TEST-1"}, {"key": "TEST-2"}, {"key": "TEST-3"}]}
+            if path == "issue/TEST-2":
+                raise Exception("Forbidden")
+            if path == "issue/TEST-3":
+                return {"changelog": {"total": 0, "histories": []}}
+            return {
+                "changelog": {"total": 1, "histories": [make_history(recent, "status", "A", "B")]}
+            }
+
+        mock_jira_client._get_json.side_effect = get_json
+
+        result = server.get_issues_changes.fn("project = TEST ORDER BY key", since="-1h")
+
+        [search] = search_calls(mock_jira_client)
+        assert search["jql"] == '(project = TEST) AND updated >= "-61m" ORDER BY key'
+        assert search["fields"] == "key"
+        assert '"TEST-1"' in result and '"B"' in result
+        assert "Forbidden" in result
+        assert "TEST-3" not in result
+        assert "_Looked at" not in result
+
+    def test_get_issues_changes_notes_truncation(self, mock_jira_client):
+        mock_jira_client._get_json.side_effect = lambda path, params=None, base=None: (
+            {"total": 120, "issues": [{"key": "TEST-1"}, {"key": "TEST-2"}]}
+            if path == "search"
+            else {"changelog": {"total": 0, "histories": []}}
+        )
+
+        result = server.get_issues_changes.fn("project = TEST", max_issues=2)
+
+        assert search_calls(mock_jira_client)[0]["maxResults"] == 2
+        assert "_Looked at 2 of 120 updated issues" in result
+
+
+def make_link(link_type, key, outward=True):
+    """A raw issue link to the issue with the given key"""
+    return {
+        "type": {"outward": link_type, "inward": f"is {link_type} by"},
+        "outwardIssue" if outward else "inwardIssue": {"key": key},
+    }
+
+
+class TestIssueTree:
+    """Test the get_issue_tree tool"""
+
+    @pytest.fixture
+    def tree(self, mock_jira_client):
+        """EPIC-1 has stories TEST-1 and TEST-2, TEST-1 has subtask TEST-3 and blocks OTHER-1"""
+        epic = MockJiraIssue("EPIC-1", "Epic").raw
+        story1 = MockJiraIssue("TEST-1", "Story 1").raw
+        story1["fields"]["issuelinks"] = [make_link("blocks", "OTHER-1")]
+        story1["fields"]["customfield_1"] = "EPIC-1"
+        story2 = MockJiraIssue("TEST-2", "Story 2").raw
+        story2["fields"]["customfield_1"] = "EPIC-1"
+        subtask = MockJiraIssue("TEST-3", "Subtask", parent=MagicMock(key="TEST-1")).raw
+        other = MockJiraIssue("OTHER-1", "Blocked").raw
+
+        def search(jql):
+            issues = {
+                "key = EPIC-1": [epic],
+                'parent in (EPIC-1) OR "Epic Link" in (EPIC-1)': [story1, story2],
+                'parent in (TEST-1, TEST-2) OR "Epic Link" in (TEST-1, TEST-2)': [subtask],
+                "key in (OTHER-1)": [other],
+            }.get(jql, [])
+            return {"total": len(issues), "issues": issues}
+
+        with patch.object(
+            server, "field_registry", server.FieldRegistry(server.JIRA_CUSTOM_FIELDS)
+        ):
+            epic_link = [{"id": "customfield_1", "name": "Epic Link"}]
+            mock_jira_client._get_json.side_effect = lambda path, **kwargs: (
+                epic_link
+                if path == "field"
+                else search(kwargs["params"]["jql"]) if path == "search" else DEFAULT
+            )
+            yield mock_jira_client
+
+    def test_walks_levels_with_one_query_each(self, tree):
+        result = server.get_issue_tree.fn("EPIC-1", depth=3)
+
+        for key in ("EPIC-1", "TEST-1", "TEST-2", "TEST-3"):
+            assert f'"key": "{key}"' in result
+        assert "OTHER-1" not in result
+        assert '"relation": "epic child"' in result
+        assert '"parent": "TEST-1"' in result
+        # Root, one query per level, and one empty query for the last level
+        assert len(search_calls(tree)) == 4
+
+    def test_depth_limit(self, tree):
+        result = server.get_issue_tree.fn("EPIC-1", depth=1)
+
+        assert '"key": "TEST-2"' in result
+        assert "TEST-3" not in result
+
+    def test_follows_links_and_fetches_comments(self, tree):
+        tree._get_json.return_value = {
+            "comments": [
+                {
+                    "id": "9",
+                    "body": "Looks good",
+                    "author": {"displayName": "Reviewer"},
+                    "created": "2025-01-01T00:00:00.000+0000",
+                }
+            ]
+        }
+
+        result = server.get_issue_tree.fn("EPIC-1", depth=2, include=["links", "comments"])
+
+        assert '"key": "OTHER-1"' in result
+        assert '"relation": "blocks"' in result
+        comment_calls = [c for c in tree._get_json.call_args_list if "/comment" in c.args[0]]
+        assert len(comment_calls) == 5
+        assert result.count("Looks good") == 5
+
+    def test_links_to_moved_issues(self, tree):
+        story = MockJiraIssue("TEST-1", "Story").raw
+        story["fields"]["issuelinks"] = [make_link("blocks", "OLD-1")]
+        story["fields"]["issuelinks"][0]["outwardIssue"]["id"] = "10042"
+        moved = MockJiraIssue("NEW-7", "Moved").raw
+        moved["id"] = "10042"
+        tree._get_json.side_effect = lambda path, **kwargs: {
+            "key = TEST-1": {"total": 1, "issues": [story]},
+            "key in (OLD-1)": {"total": 1, "issues": [moved]},
+        }.get(kwargs["params"]["jql"], {"total": 0, "issues": []})
+
+        result = server.get_issue_tree.fn("TEST-1", depth=1, include=["links"])
+
+        assert '"key": "NEW-7"' in result
+        assert '"parent": "TEST-1"' in result
+        assert '"relation": "blocks"' in result
+
+    def test_max_issues(self, tree):
+        result = server.get_issue_tree.fn("EPIC-1", depth=3, max_issues=2)
+
+        assert '"key": "TEST-1"' in result
+        assert '"key": "TEST-2"' not in result
+        assert "Stopped after 2 issues" in result
+
+    def test_unknown_include(self, tree):
+        with pytest.raises(HTTPException) as exc_info:
+            server.get_issue_tree.fn("EPIC-1", include=["attachments"])
+
+        assert exc_info.value.status_code == 400
 
 
 if __name__ == "__main__":